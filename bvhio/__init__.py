@@ -1,4 +1,5 @@
-from .lib.bvh import BvhContainer, BvhJoint
-from .lib.hierarchy import Joint
-from .lib.Parser import convertBvhToHierarchy, convertHierarchyToBvh, readAsHierarchy, readAsBvh, writeBvh, writeHierarchy
+from .lib.bvh import BvhContainer, BvhJoint, BvhKeyframes, CompactBvhJoint, CompactPose
+from .lib.hierarchy import Joint, KeyframeTrack, ForwardKinematics
+from .lib.Parser import convertBvhToHierarchy, convertHierarchyToBvh, readAsHierarchy, readAsBvh, readAsBvhBatch, writeBvh, writeHierarchy
+from .lib.Stream import BvhStream
 from SpatialTransform import Euler, Pose, Transform
@@ -0,0 +1,119 @@
+"""Vectorized spatial conversions that operate on whole arrays of frames at once.
+
+Quaternions are stored as (..., 4) arrays in the same component order as the ``glm.quat`` constructor -> (w, x, y, z).
+Euler angles are stored as (..., 3) arrays in XYZ layout, independent of the rotation order."""
+import numpy
+
+_Axes = {'X': 0, 'Y': 1, 'Z': 2}
+
+
+def quatMul(a: numpy.ndarray, b: numpy.ndarray) -> numpy.ndarray:
+    """Hamilton product ``a * b`` of two quaternion arrays, broadcasted like numpy."""
+    aw, ax, ay, az = numpy.moveaxis(a, -1, 0)
+    bw, bx, by, bz = numpy.moveaxis(b, -1, 0)
+    return numpy.stack([
+        aw * bw - ax * bx - ay * by - az * bz,
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw,
+    ], axis=-1)
+
+
+def quatInverse(quats: numpy.ndarray) -> numpy.ndarray:
+    """Inverse of (..., 4) quaternions like ``glm.inverse(quat)``."""
+    return quats * numpy.array([1.0, -1, -1, -1]) / numpy.sum(quats * quats, axis=-1, keepdims=True)
+
+
+def quatSlerp(a: numpy.ndarray, b: numpy.ndarray, weights: numpy.ndarray) -> numpy.ndarray:
+    """Spherical interpolation from (..., 4) quaternions a to b by (...) weights like ``glm.slerp(a, b, weight)``.
+    - Takes the shortest path, nearly equal quaternions are linearly interpolated."""
+    weights = numpy.asarray(weights)[..., None]
+    dot = numpy.sum(a * b, axis=-1, keepdims=True)
+    b = numpy.where(dot < 0, -b, b)
+    dot = numpy.abs(dot)
+
+    near = dot > 1 - 1e-06
+    angle = numpy.arccos(numpy.clip(dot, -1, 1))
+    sine = numpy.where(near, 1, numpy.sin(angle))
+    weightA = numpy.where(near, 1 - weights, numpy.sin((1 - weights) * angle) / sine)
+    weightB = numpy.where(near, weights, numpy.sin(weights * angle) / sine)
+    return a * weightA + b * weightB
+
+
+def retime(first: int, last: int, frameTime: float, targetFrameTime: float) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """Frame ids of another frame time that cover the frames first to last.
+    - Returns the new frame ids and the matching fractional frame ids at the current frame time.
+    - Fractional ids that are nearly whole numbers are rounded, so frames that exist in both frame times are not interpolated."""
+    if frameTime <= 0 or targetFrameTime <= 0:
+        raise ValueError('frame times must be greater than zero')
+    ratio = frameTime / targetFrameTime
+    frames = numpy.arange(round(first * ratio), round(last * ratio) + 1, dtype=numpy.int64)
+    sources = frames / ratio
+    whole = numpy.rint(sources)
+    return (frames, numpy.where(numpy.abs(sources - whole) < 1e-06, whole, sources))
+
+
+def quatRotate(quats: numpy.ndarray, vectors: numpy.ndarray) -> numpy.ndarray:
+    """Rotates (..., 3) vectors by (..., 4) quaternions like ``quat * vec3``, broadcasted like numpy."""
+    w = numpy.asarray(quats)[..., :1]
+    axis = numpy.asarray(quats)[..., 1:]
+    cross = numpy.cross(axis, vectors)
+    return vectors + 2 * (w * cross + numpy.cross(axis, cross))
+
+
+def eulerToQuat(degrees: numpy.ndarray, order: str = 'ZXY', extrinsic: bool = True) -> numpy.ndarray:
+    """Converts (frames, 3) euler angles in degrees to (frames, 4) quaternions.
+    - Same conversion as ``Euler.toQuatFrom(glm.radians(degrees), order, extrinsic)`` for every frame.
+    - The order may contain only some of the axes, missing axes are not rotated."""
+    degrees = numpy.asarray(degrees)
+    halfs = numpy.radians(degrees) * 0.5
+    order = order.upper()
+    if extrinsic: order = order[::-1]
+
+    result = numpy.zeros(degrees.shape[:-1] + (4,), dtype=halfs.dtype)
+    result[..., 0] = 1
+    for axis in order:
+        index = _Axes[axis]
+        rotation = numpy.zeros_like(result)
+        rotation[..., 0] = numpy.cos(halfs[..., index])
+        rotation[..., 1 + index] = numpy.sin(halfs[..., index])
+        result = quatMul(result, rotation)
+
+    return result
+
+
+def quatToMat(quats: numpy.ndarray) -> numpy.ndarray:
+    """Converts (..., 4) quaternions to (..., 3, 3) rotation matrices, indexed as ``[column, row]`` like ``glm.mat3_cast``."""
+    w, x, y, z = numpy.moveaxis(numpy.asarray(quats), -1, 0)
+    result = numpy.empty(w.shape + (3, 3), dtype=numpy.result_type(w, numpy.float32))
+    result[..., 0, 0] = 1 - 2 * (y * y + z * z)
+    result[..., 0, 1] = 2 * (x * y + w * z)
+    result[..., 0, 2] = 2 * (x * z - w * y)
+    result[..., 1, 0] = 2 * (x * y - w * z)
+    result[..., 1, 1] = 1 - 2 * (x * x + z * z)
+    result[..., 1, 2] = 2 * (y * z + w * x)
+    result[..., 2, 0] = 2 * (x * z + w * y)
+    result[..., 2, 1] = 2 * (y * z - w * x)
+    result[..., 2, 2] = 1 - 2 * (x * x + y * y)
+    return result
+
+
+def quatToEuler(quats: numpy.ndarray, order: str = 'ZXY', extrinsic: bool = True) -> numpy.ndarray:
+    """Converts (frames, 4) quaternions to (frames, 3) euler angles in degrees.
+    - Same conversion as ``Pose.getEuler(order, extrinsic)`` for every frame.
+    - The order must contain all three axes."""
+    m = quatToMat(quats)
+    order = order.upper()
+    if extrinsic: order = order[::-1]
+
+    def opposite(value): return numpy.sqrt(numpy.maximum(0, 1 - value**2))
+
+    if order == 'XYZ': angles = (numpy.arctan2(-m[..., 2, 1], m[..., 2, 2]), numpy.arctan2(m[..., 2, 0], opposite(m[..., 2, 0])), numpy.arctan2(-m[..., 1, 0], m[..., 0, 0]))
+    elif order == 'XZY': angles = (numpy.arctan2(m[..., 1, 2], m[..., 1, 1]), numpy.arctan2(m[..., 2, 0], m[..., 0, 0]), numpy.arctan2(-m[..., 1, 0], opposite(m[..., 1, 0])))
+    elif order == 'YXZ': angles = (numpy.arctan2(-m[..., 2, 1], opposite(m[..., 2, 1])), numpy.arctan2(m[..., 2, 0], m[..., 2, 2]), numpy.arctan2(m[..., 0, 1], m[..., 1, 1]))
+    elif order == 'YZX': angles = (numpy.arctan2(-m[..., 2, 1], m[..., 1, 1]), numpy.arctan2(-m[..., 0, 2], m[..., 0, 0]), numpy.arctan2(m[..., 0, 1], opposite(m[..., 0, 1])))
+    elif order == 'ZXY': angles = (numpy.arctan2(m[..., 1, 2], opposite(m[..., 1, 2])), numpy.arctan2(-m[..., 0, 2], m[..., 2, 2]), numpy.arctan2(-m[..., 1, 0], m[..., 1, 1]))
+    elif order == 'ZYX': angles = (numpy.arctan2(m[..., 1, 2], m[..., 2, 2]), numpy.arctan2(-m[..., 0, 2], opposite(m[..., 0, 2])), numpy.arctan2(m[..., 0, 1], m[..., 0, 0]))
+    else: raise ValueError(f'given order "{order}" is invalid. Must be "XYZ" in any order')
+
+    return numpy.degrees(numpy.stack(angles, axis=-1))
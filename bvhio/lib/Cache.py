@@ -0,0 +1,83 @@
+import hashlib
+import os
+import tempfile
+import zipfile
+from typing import Optional, Union
+
+import glm
+import numpy
+
+from .bvh import *
+
+_CacheVersion = 1
+
+
+def getCachePath(path: str, cache: Union[bool, str]) -> str:
+    """Returns the path of the cache file for the given .bvh file.
+    - If cache is True -> The cache is placed next to the file as '<path>.cache.npz'.
+    - If cache is a folder -> The cache is placed into that folder, named by the file name and a hash of its absolute path."""
+    if cache is True:
+        return f'{path}.cache.npz'
+    key = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16]
+    return os.path.join(str(cache), f'{os.path.basename(path)}.{key}.npz')
+
+
+def writeCache(path: str, source: os.stat_result, bvh: BvhContainer, motion: numpy.ndarray) -> None:
+    """Stores the skeleton and the motion matrix as uncompressed arrays.
+    - The size and modification time of the source file are stored to validate the cache later.
+    - The file is replaced atomically, so other processes never read a partially written cache."""
+    layout = bvh.Root.layout()
+    index = {id(joint): i for joint, i, _ in layout}
+    parents = [-1] * len(layout)
+    for joint, i, _ in layout:
+        for child in joint.Children:
+            parents[index[id(child)]] = i
+
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as file:
+            numpy.savez(
+                file,
+                version=_CacheVersion,
+                size=source.st_size,
+                mtime=source.st_mtime_ns,
+                frameCount=bvh.FrameCount,
+                frameTime=bvh.FrameTime,
+                names=numpy.array([joint.Name for joint, _, _ in layout], dtype=str),
+                parents=numpy.array(parents, dtype=numpy.int64),
+                offsets=numpy.array([joint.Offset.to_list() for joint, _, _ in layout], dtype=float).reshape(-1, 3),
+                endSites=numpy.array([(joint.EndSite if joint.EndSite is not None else glm.vec3()).to_list() for joint, _, _ in layout], dtype=float).reshape(-1, 3),
+                hasEndSite=numpy.array([joint.EndSite is not None for joint, _, _ in layout], dtype=bool),
+                channels=numpy.array([' '.join(joint.Channels) for joint, _, _ in layout], dtype=str),
+                motion=motion)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary): os.remove(temporary)
+        raise
+
+
+def readCache(path: str, source: os.stat_result, loadKeyFrames: bool = True) -> Optional[tuple[BvhContainer, Optional[numpy.ndarray]]]:
+    """Loads the skeleton and the motion matrix from the cache file.
+    - Returns None if there is no cache, it is not readable or it does not match the size and modification time of the source file.
+    - The motion is only read if loadKeyFrames is True. The joints of the container have no keyframes yet."""
+    try:
+        with open(path, 'rb') as file, numpy.load(file, allow_pickle=False) as data:
+            if int(data['version']) != _CacheVersion or int(data['size']) != source.st_size or int(data['mtime']) != source.st_mtime_ns:
+                return None
+
+            joints: list[BvhJoint] = []
+            for name, parent, offset, endSite, hasEndSite, channels in zip(
+                    data['names'].tolist(), data['parents'].tolist(), data['offsets'].tolist(),
+                    data['endSites'].tolist(), data['hasEndSite'].tolist(), data['channels'].tolist()):
+                joint = BvhJoint(name, glm.vec3(*offset))
+                joint.EndSite = glm.vec3(*endSite) if hasEndSite else None
+                joint.Channels = channels.split()
+                if parent >= 0: joints[parent].Children.append(joint)
+                joints.append(joint)
+
+            bvh = BvhContainer(joints[0], int(data['frameCount']), float(data['frameTime']))
+            return (bvh, data['motion'] if loadKeyFrames else None)
+    except (OSError, ValueError, KeyError, IndexError, zipfile.BadZipFile):
+        return None
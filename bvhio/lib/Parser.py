@@ -1,12 +1,17 @@
 import errno
+import mmap
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 from io import TextIOWrapper
-from typing import Optional
+from itertools import islice, repeat
+from typing import Iterable, Optional, Union
 
 import glm
 import numpy
-from SpatialTransform import Euler, Pose, Transform
+from SpatialTransform import Pose, Transform
 
+from . import Batch, Cache
 from .bvh import *
 from .hierarchy import *
 
@@ -19,50 +24,139 @@ def parseLine(file: TextIOWrapper, lineNumber: int) -> tuple[int, list[str], tup
     return (lineNumber, tokens, debugInfo)
 
 
-def readAsBvh(path: str, loadKeyFrames: bool = True) -> BvhContainer:
-    """Deserialize .bvh file into a simple structure."""
+def readAsBvh(
+        path: str,
+        loadKeyFrames: bool = True,
+        columnar: bool = False,
+        memoryMap: bool = False,
+        cache: Union[bool, str] = False,
+        frames: Optional[Union[range, slice]] = None,
+        joints: Optional[list[str]] = None,
+        compact: bool = False,
+        dtype: type = numpy.float64) -> BvhContainer:
+    """Deserialize .bvh file into a simple structure.
+    - If columnar is True -> The motion is kept as one matrix in the container and the joint keyframes are lazy views into it.
+    - If memoryMap is True -> The motion section is tokenized directly from a read-only memory map of the file.
+      Pages are loaded on demand and shared in the page cache by all processes reading the same file.
+    - If cache is True or a folder -> The parsed skeleton and motion are stored as binary arrays next to the file or in that folder.
+      Later reads load the arrays instead of parsing the text, as long as size and modification time of the file are unchanged.
+    - If frames is a range or slice -> Only these frame ids are read, e.g. ``slice(None, None, 4)`` for every 4th frame.
+      Lines of other frames are skipped without parsing, FrameCount is the count of read frames and FrameTime is scaled by the step.
+    - If joints is a list of names -> Only the channels of these joints are parsed. Other joints keep their definition but have no keyframes,
+      and the motion matrix only holds the channels of the selected joints.
+    - The cache is only written if the whole motion is read.
+    - If compact is True -> Joints are ``CompactBvhJoint`` objects, which store their attributes in slots.
+      If columnar is False, keyframes are also lists of ``CompactPose`` records instead of ``Pose`` objects.
+    - dtype is the float type the motion is parsed into, e.g. ``numpy.float32`` halves the memory of the motion matrix.
+      The cache always stores float64 values and is only written by float64 reads."""
     if not os.path.exists(path):
         raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
 
-    bvh = BvhContainer()
+    if cache:
+        source = os.stat(path)
+        cachePath = Cache.getCachePath(path, cache)
+        cached = Cache.readCache(cachePath, source, loadKeyFrames)
+        if cached is not None:
+            bvh, motion = cached
+            rows, columns, names = _selectMotion(bvh, frames, joints)
+            if motion is not None:
+                if rows is not None: motion = motion[rows.start:rows.stop:rows.step]
+                if columns is not None: motion = motion[:, columns]
+                motion = motion.astype(dtype, copy=False)
+            return _loadMotion(bvh, motion, columnar, rows, names, compact)
+
     with open(path, "r") as file:
-        # check for 'HIERARCHY' start
-        line, tokens, debugInfo = parseLine(file, 0)
-        if not tokens[0] == 'HIERARCHY' and len(tokens) == 1:
-            raise SyntaxError('First line must be only "HIERARCHY"', debugInfo)
+        bvh, line = _parseHeader(file)
+        rows, columns, names = _selectMotion(bvh, frames, joints)
 
-        # parse joints recursivly
-        line, tokens, debugInfo = parseLine(file, line)
-        if tokens[0] != 'ROOT':
-            raise SyntaxError('First Joint must be defined as "ROOT"', debugInfo)
-        bvh.Root = _parseJoint(file, _deserializeJointName(tokens, debugInfo))
+        # parse motion data
+        motion = None
+        if loadKeyFrames:
+            channels = sum(len(joint.Channels) for joint, _, _ in bvh.Root.layout())
+            if rows is not None and memoryMap:
+                with open(path, "rb") as binary, mmap.mmap(binary.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                    buffer.seek(file.tell())
+                    motion = _deserializeMotionBlock(_selectLines(iter(buffer.readline, b''), rows), line, len(rows), channels, columns, dtype)
+            elif rows is not None:
+                motion = _deserializeMotionBlock(_selectLines(file, rows), line, len(rows), channels, columns, dtype)
+            elif memoryMap:
+                with open(path, "rb") as binary, mmap.mmap(binary.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                    motion = _deserializeMotionMapped(buffer, file.tell(), line, bvh.FrameCount, channels, columns, dtype)
+            else:
+                motion = _deserializeMotionBlock(file, line, bvh.FrameCount, channels, columns, dtype)
+            if cache and rows is None and columns is None and motion.dtype == numpy.float64:
+                Cache.writeCache(cachePath, source, bvh, motion)
+
+        return _loadMotion(bvh, motion, columnar, rows, names, compact)
+
+
+def _selectMotion(bvh: BvhContainer, frames: Optional[Union[range, slice]], joints: Optional[list[str]]) -> tuple[Optional[range], Optional[list[int]], Optional[set[str]]]:
+    """Resolves the frame and joint selection of ``readAsBvh()`` into the frame ids, the motion columns and the joint names to read."""
+    rows = None
+    if frames is not None:
+        if isinstance(frames, range): frames = slice(frames.start, frames.stop, frames.step)
+        rows = range(*frames.indices(bvh.FrameCount))
+        if rows.step < 1:
+            raise ValueError('Frame step must be positive')
+
+    columns, names = None, None
+    if joints is not None:
+        names = set(joints)
+        layout = [joint for joint, _, _ in bvh.Root.layout()]
+        missing = names - {joint.Name for joint in layout}
+        if missing:
+            raise ValueError(f'Joints {sorted(missing)} are not part of the hierarchy')
+        columns, index = [], 0
+        for joint in layout:
+            if joint.Name in names:
+                columns.extend(range(index, index + len(joint.Channels)))
+            index += len(joint.Channels)
+    return (rows, columns, names)
+
+
+def _selectLines(lines: Iterable, rows: range) -> list:
+    """Takes the lines of the selected frames, the other lines are skipped without parsing their values."""
+    return list(islice((row for row in lines if row.strip()), rows.start, rows.stop, rows.step))
+
+
+def _loadMotion(bvh: BvhContainer, motion: Optional[numpy.ndarray], columnar: bool, rows: Optional[range], names: Optional[set[str]], compact: bool = False) -> BvhContainer:
+    """Sets the keyframes of the selected joints and applies the frame selection to the container."""
+    if compact:
+        bvh.Root = CompactBvhJoint.fromJoint(bvh.Root)
+    if motion is not None:
+        _deserializeMotion(bvh.Root, motion, columnar=columnar, joints=names, compact=compact)
+        if columnar: bvh.Motion = motion
+    if rows is not None:
+        bvh.FrameCount = len(rows)
+        bvh.FrameTime = bvh.FrameTime * rows.step
+    return bvh
 
-        # check for 'MOTION' start
-        line, tokens, debugInfo = parseLine(file, line)
-        if not tokens[0] == 'MOTION' or not len(tokens) == 1:
-            raise SyntaxError('After end of hierarchy must follow "MOTION"', debugInfo)
 
-        # check for frame count
-        line, tokens, debugInfo = parseLine(file, line)
-        if not tokens[0] == 'Frames:' or not len(tokens) == 2:
-            raise SyntaxError('First line of "MOTION" section has to be "Frames: X"', debugInfo)
-        else:
-            bvh.FrameCount = int(_deserializeFrameCount(tokens[1:], debugInfo))
+def readAsBvhBatch(paths: list[str], workers: Optional[int] = None, loadKeyFrames: bool = True, cache: Union[bool, str] = False, dtype: type = numpy.float64) -> list[Union[BvhContainer, Exception]]:
+    """Deserialize many .bvh files in parallel with a pool of worker processes.
+    - Results are in the order of the paths. The containers are columnar, so only one motion matrix per file is transferred.
+    - If a file can not be read -> Its result is the raised exception, the other files are not affected.
+    - If workers is None -> One worker per CPU core is used. If workers is 1 -> The files are read in this process.
+    - dtype is the float type of the motion matrices as in ``readAsBvh()``."""
+    paths = list(paths)
+    if workers is None: workers = os.cpu_count() or 1
+    if workers < 1: raise ValueError('Worker count must be at least 1')
 
-        # check for frame rate
-        line, tokens, debugInfo = parseLine(file, line)
-        if not tokens[0] == 'Frame' or not len(tokens) == 3:
-            raise SyntaxError('After frame count must follow "Frame Time"', debugInfo)
-        else:
-            bvh.FrameTime = _deserializeFrameTime(tokens[2:], debugInfo)
+    arguments = (paths, repeat(loadKeyFrames), repeat(cache), repeat(dtype))
+    if workers == 1 or len(paths) < 2:
+        return list(map(_readAsBvhWorker, *arguments))
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+        return list(executor.map(_readAsBvhWorker, *arguments, chunksize=max(1, len(paths) // (workers * 4))))
 
-        # parse motion data
-        if loadKeyFrames:
-            for _ in range(bvh.FrameCount):
-                line, tokens, debugInfo = parseLine(file, line)
-                _deserializeMotion(bvh.Root, _deserializeKeyframe(tokens, debugInfo))
 
-        return bvh
+def _readAsBvhWorker(path: str, loadKeyFrames: bool, cache: Union[bool, str], dtype: type = numpy.float64) -> Union[BvhContainer, Exception]:
+    try:
+        return readAsBvh(path, loadKeyFrames, columnar=True, cache=cache, dtype=dtype)
+    except Exception as error:
+        if isinstance(error, SyntaxError):
+            # the debug info holds the open file, which can not be sent back to the main process
+            return SyntaxError(error.msg, (path, error.lineno, error.offset, error.text))
+        return error
 
 
 def convertBvhToHierarchy(bvh: BvhJoint) -> Joint:
@@ -70,30 +164,66 @@ def convertBvhToHierarchy(bvh: BvhJoint) -> Joint:
     # copy data into a joint
     restPose = Transform(name=f'RestPose.{bvh.Name}', position=bvh.Offset, rotation=bvh.getRotation())
     joint = Joint(bvh.Name, restPose=restPose)
-    for frame, key in enumerate(bvh.Keyframes):
-        joint.setKeyframe(frame, Transform.fromPose(key), keep=None)
+    positions, rotations = bvh.getKeyframeArrays()
 
-    # correct bvh keyframe data
-    for frame, key in joint.Keyframes:
-        # project offset into rest pose because it is given as overwrite and does not include the rest pose rotation.
-        key.Position = joint.RestPose.SpaceInverse * key.Position
+    # correct bvh keyframe data for all frames at once
+    # keys are set relative to the rest pose, then the offset is projected into the rest pose again
+    # because it is given as overwrite and does not include the rest pose rotation.
+    space = numpy.array(restPose.SpaceInverse, dtype=float)
+    positions = positions @ space[:3, :3].T + space[:3, 3]
+    positions = positions @ space[:3, :3].T + space[:3, 3]
 
-        # the rotation is already given as difference, but the multiplication order is switched.
-        key.Rotation = key.Rotation * joint.RestPose.Rotation
-        key.Rotation = (glm.inverse(joint.RestPose.Rotation) * key.Rotation)
+    # the rotation is already given as difference, but the multiplication order is switched.
+    rotation = numpy.array(restPose.Rotation.to_list(), dtype=float)
+    inverse = Batch.quatInverse(rotation)
+    rotations = Batch.quatMul(Batch.quatMul(inverse, Batch.quatMul(inverse, rotations)), rotation)
+    joint.setKeyframes(numpy.arange(len(positions)), positions, rotations, keep=[])
 
     for child in bvh.Children:
         # correct the rest pose, because its given without the parents rest pose rotation.
         childJoint = convertBvhToHierarchy(child)
         childJoint.RestPose.Position = glm.inverse(joint.RestPose.Rotation) * childJoint.RestPose.Position
         childJoint.RestPose.Rotation = glm.inverse(joint.RestPose.Rotation) * childJoint.RestPose.Rotation
-        joint.attach(childJoint, keep=None)
+        _attachConverted(joint, childJoint)
 
     return joint
 
 
-def convertHierarchyToBvh(joint: Joint, frames: int, worldSpace: Optional[Pose] = None) -> BvhJoint:
-    """Converts a joint structure into a deseralized bvh structure."""
+def _attachConverted(joint: Joint, child: Joint) -> None:
+    """Attaches the child with the same result as ``joint.attach(child)``, but rebases the rest pose and all keyframes at once.
+    - The joint is expected to have no parent and the joints are expected to have no scale, which is true for converted bvh joints."""
+    oldRestPosition = numpy.array(child.RestPose.Position.to_list(), dtype=float)
+    oldRestRotation = numpy.array(child.RestPose.Rotation.to_list(), dtype=float)
+    joint.attach(child, keep=[])
+
+    # the rest pose keeps its world space in relation to the rest pose of the joint
+    child.RestPose.Position = joint.RestPose.SpaceInverse * child.RestPose.Position
+    child.RestPose.Rotation = glm.inverse(joint.RestPose.Rotation) * child.RestPose.Rotation
+    if len(child.Keyframes) == 0: return
+
+    # the keyframes keep the world space of the child pose in relation to the pose of the joint at the same frame
+    keys = child.Keyframes
+    jointPositions, jointRotations, _ = joint.Keyframes.sample(keys.Frames)
+    jointSpace = numpy.array(joint.RestPose.SpaceWorld, dtype=float)
+    jointPositions = jointPositions @ jointSpace[:3, :3].T + jointSpace[:3, 3]
+    jointRotations = Batch.quatMul(numpy.array(joint.RestPose.RotationWorld.to_list(), dtype=float), jointRotations)
+
+    positions = oldRestPosition + Batch.quatRotate(oldRestRotation, keys.Positions)
+    rotations = Batch.quatMul(oldRestRotation, keys.Rotations)
+    jointInverse = Batch.quatInverse(jointRotations)
+    positions = Batch.quatRotate(jointInverse, positions - jointPositions)
+    rotations = Batch.quatMul(jointInverse, rotations)
+
+    restInverse = Batch.quatInverse(numpy.array(child.RestPose.Rotation.to_list(), dtype=float))
+    keys.Positions = Batch.quatRotate(restInverse, positions - numpy.array(child.RestPose.Position.to_list(), dtype=float))
+    keys.Rotations = Batch.quatMul(restInverse, rotations)
+
+
+def convertHierarchyToBvh(joint: Joint, frames: int, worldSpace: Optional[Pose] = None, columnar: bool = False) -> BvhJoint:
+    """Converts a joint structure into a deseralized bvh structure.
+    - The keyframes of the bvh joints are lists of poses, changes to them are written by ``writeBvh()``.
+    - If columnar is True -> The keyframes are lazy views into a motion matrix with position and rotation channels of all frames.
+      Poses taken from a view are decoded copies, changed poses need to be assigned back to the view."""
 
     if worldSpace is None:
         worldSpace = Pose()
@@ -101,38 +231,79 @@ def convertHierarchyToBvh(joint: Joint, frames: int, worldSpace: Optional[Pose]
     bvh = BvhJoint(joint.Name)
     bvh.Offset = worldSpace.Space * joint.RestPose.Position
     bvh.EndSite = (worldSpace.Space * (0, 1, 0)) * glm.length(joint.RestPose.Position) * 0.3
-    bvh.Keyframes = [joint.getKeyframe(frame).toPose(worldSpace=False) for frame in range(frames)]
+    positions, rotations, _ = joint.Keyframes.sample(range(frames))
 
     worldSpace.Rotation = worldSpace.Rotation * joint.RestPose.Rotation
     worldSpace.Scale = worldSpace.Scale * joint.RestPose.Scale
 
-    if 1e-02 < glm.l1Norm(sum([glm.abs(pose.Position) for pose in bvh.Keyframes])): # type: ignore
+    if 1e-02 < numpy.abs(positions).sum():
         bvh.Channels.extend(['Xposition', 'Yposition', 'Zposition'])
 
-    if 1e-02 < (sum([sum([abs(d) for d in (pose.Rotation - glm.quat()).to_list()]) for pose in bvh.Keyframes])): # type: ignore
+    if 1e-02 < numpy.abs(rotations - [1.0, 0, 0, 0]).sum():
         bvh.Channels.extend(['Zrotation', 'Xrotation', 'Yrotation'])
 
     # convert data to bvh
-    for key in bvh.Keyframes:
-        key.Position = bvh.Offset + (worldSpace.Space * key.Position)
-        key.Rotation = worldSpace.Rotation * key.Rotation
-        key.Rotation = (key.Rotation * glm.inverse(worldSpace.Rotation))
+    space = numpy.array(worldSpace.Space, dtype=float)
+    rotation = numpy.array(worldSpace.Rotation.to_list(), dtype=float)
+    positions = numpy.array(bvh.Offset, dtype=float) + positions @ space[:3, :3].T + space[:3, 3]
+    rotations = Batch.quatMul(Batch.quatMul(rotation, rotations), Batch.quatInverse(rotation))
+    motion = numpy.concatenate((positions, Batch.quatToEuler(rotations, 'ZXY', extrinsic=False)[:, [2, 0, 1]]), axis=1)
+    keyframes = BvhKeyframes(motion, 0, ['Xposition', 'Yposition', 'Zposition', 'Zrotation', 'Xrotation', 'Yrotation'], bvh.Offset)
+    bvh.Keyframes = keyframes if columnar else keyframes.toList()
 
     # add children
     for child in joint.Children:
-        childBvh = convertHierarchyToBvh(child, frames, worldSpace.duplicate())
+        childBvh = convertHierarchyToBvh(child, frames, worldSpace.duplicate(), columnar)
         bvh.Children.append(childBvh)
 
     return bvh
 
 
-def readAsHierarchy(path: str, loadKeyFrames: bool = True) -> Joint:
-    """Deserialize a .bvh file into a joint hierarchy."""
-    r = readAsBvh(path, loadKeyFrames).Root
+def readAsHierarchy(path: str, loadKeyFrames: bool = True, cache: Union[bool, str] = False) -> Joint:
+    """Deserialize a .bvh file into a joint hierarchy.
+    - If cache is True or a folder -> The parsed file is cached as in ``readAsBvh()``."""
+    r = readAsBvh(path, loadKeyFrames, columnar=True, cache=cache).Root
     assert r is not None, "Root must be defined."
     return convertBvhToHierarchy(r).loadRestPose(recursive=True)
 
 
+def _parseHeader(file: TextIOWrapper) -> tuple[BvhContainer, int]:
+    """Parses the file from the start until the motion data begins. Returns the container without keyframes and the current line."""
+    bvh = BvhContainer()
+
+    # check for 'HIERARCHY' start
+    line, tokens, debugInfo = parseLine(file, 0)
+    if not tokens[0] == 'HIERARCHY' and len(tokens) == 1:
+        raise SyntaxError('First line must be only "HIERARCHY"', debugInfo)
+
+    # parse joints recursivly
+    line, tokens, debugInfo = parseLine(file, line)
+    if tokens[0] != 'ROOT':
+        raise SyntaxError('First Joint must be defined as "ROOT"', debugInfo)
+    bvh.Root = _parseJoint(file, _deserializeJointName(tokens, debugInfo))
+
+    # check for 'MOTION' start
+    line, tokens, debugInfo = parseLine(file, line)
+    if not tokens[0] == 'MOTION' or not len(tokens) == 1:
+        raise SyntaxError('After end of hierarchy must follow "MOTION"', debugInfo)
+
+    # check for frame count
+    line, tokens, debugInfo = parseLine(file, line)
+    if not tokens[0] == 'Frames:' or not len(tokens) == 2:
+        raise SyntaxError('First line of "MOTION" section has to be "Frames: X"', debugInfo)
+    else:
+        bvh.FrameCount = int(_deserializeFrameCount(tokens[1:], debugInfo))
+
+    # check for frame rate
+    line, tokens, debugInfo = parseLine(file, line)
+    if not tokens[0] == 'Frame' or not len(tokens) == 3:
+        raise SyntaxError('After frame count must follow "Frame Time"', debugInfo)
+    else:
+        bvh.FrameTime = _deserializeFrameTime(tokens[2:], debugInfo)
+
+    return (bvh, line)
+
+
 def _parseJoint(file: TextIOWrapper, name: str, line: int = 0) -> BvhJoint:
     # check for open bracket
     line, tokens, debugInfo = parseLine(file, line)
@@ -222,37 +393,111 @@ def _deserializeFrameCount(data: list, debugInfo: tuple) -> float:
         raise SyntaxError('Frame time be numerical', debugInfo) from e
 
 
-def _deserializeKeyframe(data: list, debugInfo: tuple) -> numpy.ndarray:
+def _deserializeMotionBlock(
+        file: Union[TextIOWrapper, list[str], list[bytes]],
+        line: int,
+        frames: int,
+        channels: int,
+        columns: Optional[list[int]] = None,
+        dtype: type = numpy.float64) -> numpy.ndarray:
+    """Reads the given count of frames at once into a (frames, channels) matrix of the dtype. The source is the file or a list of its lines.
+    - If columns is given -> Only these columns are converted and the matrix has one column per given column.
+      Every line must still have the given channel count."""
+    debugInfo = (file, line + 1, 0, '')
+    # blank lines are no frames, loadtxt skips them too but warns about lines with whitespace only
+    rows: Iterable[Union[str, bytes]] = (row for row in file if row.strip())
+    if columns is not None and frames > 0:
+        # the selected columns alone can not tell if a line has too few or too many values
+        rows = list(islice(rows, frames))
+        if len(rows) != frames:
+            raise SyntaxError(f'Frame count mismatch, expected {frames} keyframes but found {len(rows)}', debugInfo)
+        counts = _countValues(rows)
+        if numpy.any(counts != channels):
+            offset = int(numpy.flatnonzero(counts != channels)[0])
+            raise SyntaxError(f'Channel count mismatch, expected {channels} values per keyframe but found {counts[offset]}', (debugInfo[0], line + offset + 1, 0, str(rows[offset])))
+    if columns is not None:
+        channels = len(columns)
+    if frames == 0 or channels == 0:
+        return numpy.zeros((frames, channels), dtype=dtype)
+
     try:
-        return numpy.array(list(map(float, data)))
+        motion = numpy.loadtxt(rows, dtype=dtype, ndmin=2, max_rows=frames, usecols=columns)
     except ValueError as e:
-        raise SyntaxError('Keyframe must be numerics only', debugInfo) from e
-
-
-def _deserializeMotion(joint: BvhJoint, data: numpy.ndarray, index=0) -> int:
-    position = glm.vec3(joint.Offset)
-    rotation = glm.vec3(0)
-    rotOrder = ''
-
-    for channel in joint.Channels:
-        if 'Xposition' == channel: position.x = data[index]
-        elif 'Yposition' == channel: position.y = data[index]
-        elif 'Zposition' == channel: position.z = data[index]
-        elif 'Xrotation' == channel: rotation.x = data[index]; rotOrder += 'X'
-        elif 'Yrotation' == channel: rotation.y = data[index]; rotOrder += 'Y'
-        elif 'Zrotation' == channel: rotation.z = data[index]; rotOrder += 'Z'
-        else: index -= 1
-        index += 1
-
-    rotation = Euler.toQuatFrom(glm.radians(rotation), order=rotOrder, extrinsic=False)
-    joint.Keyframes.append(Pose(position, rotation))
+        raise SyntaxError('Keyframes must be numerics only and have the same channel count', debugInfo) from e
+
+    if motion.shape[0] != frames:
+        raise SyntaxError(f'Frame count mismatch, expected {frames} keyframes but found {motion.shape[0]}', debugInfo)
+    if motion.shape[1] != channels:
+        raise SyntaxError(f'Channel count mismatch, expected {channels} values per keyframe but found {motion.shape[1]}', debugInfo)
+    return motion
+
+
+def _countValues(lines: Union[list[str], list[bytes]]) -> numpy.ndarray:
+    """Counts the whitespace separated values of each line at once, without splitting the lines."""
+    rows = [row.rstrip() for row in lines]
+    data = '\n'.join(rows).encode() if isinstance(rows[0], str) else b'\n'.join(rows)
+    chars = numpy.frombuffer(data + b'\n', dtype=numpy.uint8)
+    space = chars <= ord(' ')
+    starts = numpy.flatnonzero(~space[1:] & space[:-1]) + 1
+    if not space[0]: starts = numpy.append(0, starts)
+    ends = numpy.searchsorted(starts, numpy.flatnonzero(chars == ord('\n')))
+    return numpy.diff(ends, prepend=0)
+
+
+_MappedBlockSize = 1 << 22
+
+
+def _deserializeMotionMapped(
+        buffer: mmap.mmap,
+        start: int,
+        line: int,
+        frames: int,
+        channels: int,
+        columns: Optional[list[int]] = None,
+        dtype: type = numpy.float64) -> numpy.ndarray:
+    """Reads the given count of frames from the mapped buffer into a (frames, channels) matrix.
+    The buffer is tokenized in blocks of whole lines, so only one block is copied out of the map at a time."""
+    width = len(columns) if columns is not None else channels
+    if frames == 0 or channels == 0:
+        return numpy.zeros((frames, width), dtype=dtype)
+
+    motion = numpy.empty((frames, width), dtype=dtype)
+    frame = 0
+    while frame < frames:
+        if start >= len(buffer):
+            raise SyntaxError(f'Frame count mismatch, expected {frames} keyframes but found {frame}', (buffer, line + frame + 1, 0, ''))
+        stop = buffer.find(b'\n', start + _MappedBlockSize)
+        stop = len(buffer) if stop < 0 else stop + 1
+        lines = [row for row in buffer[start:stop].splitlines() if row.strip()][:frames - frame]
+        block = _deserializeMotionBlock(lines, line + frame, len(lines), channels, columns, dtype)
+        motion[frame:frame + len(block)] = block
+        frame += len(block)
+        start = stop
+    return motion
+
+
+def _deserializeMotion(joint: BvhJoint, motion: numpy.ndarray, index: int = 0, columnar: bool = False, joints: Optional[set[str]] = None, compact: bool = False) -> int:
+    if joints is None or joint.Name in joints:
+        keyframes = BvhKeyframes(motion, index, joint.Channels, joint.Offset)
+        joint.Keyframes = keyframes if columnar else keyframes.toCompact() if compact else keyframes.toList()
+        index = keyframes.Columns.stop
+    else:
+        joint.Keyframes = []
 
     for child in joint.Children:
-        index = _deserializeMotion(child, data, index)
+        index = _deserializeMotion(child, motion, index, columnar, joints, compact)
     return index
 
 
-def writeBvh(path: str, bvh: BvhContainer, percision: int = 9) -> None:
+def writeBvh(path: str, bvh: BvhContainer, percision: int = 9, fast: bool = False) -> None:
+    """Creates an .bvh file from the given container.
+    - percision limits the percision of floating numbers be written.
+    - If fast is False -> Values are written as rounded floats without trailing zeros, like ``round(value, percision)``.
+    - If fast is True -> Values are written in fixed-point notation with exactly ``percision`` decimals, which is formatted several times faster.
+    - Unchanged channels of a columnar container are written as they were read.
+      Other channels are converted from the keyframe poses, which store float32 values, so they differ from the read values by up to about 1e-04
+      and zeros may be written as tiny values like ``5e-09``.
+    - Data will be overwritten if the file already exists"""
     assert bvh.Root is not None, "Root must be defined."
     assert bvh.FrameCount is not None, "FrameCount must be defined."
     with open(path, "w") as file:
@@ -263,9 +508,9 @@ def writeBvh(path: str, bvh: BvhContainer, percision: int = 9) -> None:
         file.write(f'Frames: {bvh.FrameCount}\n')
         file.write(f'Frame Time: {bvh.FrameTime}\n')
 
-        for frame in range(bvh.FrameCount):
-            writeMotion(file, bvh.Root, frame, percision)
-            file.write('\n')
+        motion = _serializeMotion(bvh.Root, bvh.FrameCount)
+        for start in range(0, motion.shape[0], _MotionChunkSize):
+            file.write(_formatMotion(motion[start:start + _MotionChunkSize], percision, fast))
 
 
 def writeHierarchy(path: str, root: Joint, frameTime: float, frames: int, percision: int = 9) -> None:
@@ -276,7 +521,7 @@ def writeHierarchy(path: str, root: Joint, frameTime: float, frames: int, percis
     - percision limits the percision of floating numbers be written.
     - Data will be overwritten if the file already exists"""
     frames = (root.getKeyframeRange()[1] + 1) if frames is None else frames
-    container = BvhContainer(convertHierarchyToBvh(root, frames + 1), frames, frameTime)
+    container = BvhContainer(convertHierarchyToBvh(root, frames + 1, columnar=True), frames, frameTime)
     writeBvh(path, container, percision)
 
 
@@ -303,22 +548,56 @@ def writeJoint(file: TextIOWrapper, joint: BvhJoint, indent: int, isFirst: bool,
     file.write(f'{"  "*indent}}}\n')
 
 
-def writeMotion(file: TextIOWrapper, joint: BvhJoint, frame: int, percision: int) -> None:
-    rotOrder = ''.join([rot[0] for rot in joint.Channels if rot[1:] == 'rotation'])
-    if 'Z' not in rotOrder: rotOrder += 'Z'
-    if 'X' not in rotOrder: rotOrder += 'X'
-    if 'Y' not in rotOrder: rotOrder += 'Y'
-
-    rotation = joint.Keyframes[frame].getEuler(rotOrder, extrinsic=False)
-    position = joint.Keyframes[frame].Position
-
-    for channel in joint.Channels:
-        if 'Xposition' == channel: file.write(f'{round(position.x, percision)} '); continue
-        if 'Yposition' == channel: file.write(f'{round(position.y, percision)} '); continue
-        if 'Zposition' == channel: file.write(f'{round(position.z, percision)} '); continue
-        if 'Xrotation' == channel: file.write(f'{round(rotation.x, percision)} '); continue
-        if 'Yrotation' == channel: file.write(f'{round(rotation.y, percision)} '); continue
-        if 'Zrotation' == channel: file.write(f'{round(rotation.z, percision)} '); continue
-
-    for child in joint.Children:
-        writeMotion(file, child, frame, percision)
+def _serializeMotion(root: BvhJoint, frames: int) -> numpy.ndarray:
+    """Collects the channel values of all joints into a (frames, channels) matrix."""
+    columns: list[numpy.ndarray] = []
+    for joint, _, _ in root.layout():
+        columns.extend(_serializeChannels(joint, frames))
+    return numpy.stack(columns, axis=1) if columns else numpy.zeros((frames, 0))
+
+
+def _serializeChannels(joint: BvhJoint, frames: int) -> list[numpy.ndarray]:
+    # unchanged channels of columnar data can be taken as they are
+    keyframes = joint.Keyframes
+    if len(keyframes) < frames:
+        raise ValueError(f'Joint "{joint.Name}" has only {len(keyframes)} keyframes, but {frames} frames are written')
+    if isinstance(keyframes, BvhKeyframes) and keyframes.isColumnar():
+        columns = keyframes.getChannelColumns(joint.Channels)
+        if columns is not None:
+            return list(keyframes.Motion[:frames, columns].T)
+
+    positions, rotations = joint.getKeyframeArrays()
+    return BvhKeyframes.encode(positions[:frames], rotations[:frames], joint.Channels)
+
+
+_MotionChunkSize = 4096
+_TrailingZeros = re.compile(r'0+(?= )')
+_TrailingPoint = re.compile(r'\. ')
+
+
+def _formatMotion(motion: numpy.ndarray, percision: int, fast: bool) -> str:
+    """Formats the rows of a motion matrix as text block. Each value is followed by a space and each row by a line break."""
+    if motion.shape[1] == 0:
+        return '\n' * motion.shape[0]
+    rowFormat = (f'%.{percision}f ' * motion.shape[1]) + '\n'
+    if fast:
+        return (rowFormat * motion.shape[0]) % tuple(motion.ravel().tolist())
+
+    # Fixed-point text without trailing zeros equals the text of 'round(value, percision)',
+    # unless the value is printed in scientific notation or has more than 15 significant digits.
+    # Values that are rounded to zero are printed as '0.0' or '-0.0' by both.
+    values = motion.ravel().tolist()
+    text = (rowFormat * motion.shape[0]) % tuple(values)
+    text = _TrailingPoint.sub('.0 ', _TrailingZeros.sub('', text)) if percision > 0 else text.replace(' ', '.0 ')
+
+    absolute = numpy.abs(motion)
+    exceptions = (absolute >= 10.0 ** (15 - percision)) | ((absolute < 1.0001e-4) & (absolute >= 0.4 * 10.0 ** -percision)) | ~numpy.isfinite(motion)
+    indices = numpy.flatnonzero(exceptions).tolist() if percision <= 15 else list(range(len(values)))
+    if not indices:
+        return text
+
+    # only the exceptional values are formatted one by one
+    tokens = text.split()
+    for index in indices:
+        tokens[index] = str(round(values[index], percision))
+    return ((('%s ' * motion.shape[1]) + '\n') * motion.shape[0]) % tuple(tokens)
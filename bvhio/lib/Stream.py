@@ -0,0 +1,226 @@
+import errno
+import mmap
+import os
+import tempfile
+import zipfile
+from itertools import islice
+from typing import BinaryIO, Iterator, Optional, Union, overload
+
+import numpy
+
+from .bvh import *
+from .Parser import _deserializeMotionBlock, _parseHeader
+
+
+class BvhStream:
+    """Reads the hierarchy of a .bvh file once and provides its motion lazily, without loading the whole motion into memory.
+    - Container holds the hierarchy, frame count and frame time. Its joints have no keyframes.
+    - Iterating over the stream yields the frames one by one as arrays of channel values.
+    - ``chunks()`` yields blocks of frames as (frames, channels) arrays, memory is bounded by the chunk size.
+    - Indexing like ``stream[150000]`` or ``stream[a:b]`` decodes only the requested frames, based on the frame index.
+    - The frame index holds the byte offset of each frame. It is built once with a single scan and,
+      if sidecar is True, stored next to the file as '<path>.idx'. It is reused as long as size and modification time of the file are unchanged.
+    - If memoryMap is True -> Indexed frames are decoded directly from a read-only memory map of the file,
+      so processes reading the same file share its pages in the page cache.
+    - dtype is the float type the frames are parsed into, e.g. ``numpy.float32``.
+    - Use it as context manager or call ``close()`` after use."""
+    Path: str
+    Container: BvhContainer
+    Channels: int
+    DType: numpy.dtype
+    SidecarPath: Optional[str]
+
+    @property
+    def Root(self) -> BvhJoint:
+        return self.Container.Root
+
+    @property
+    def FrameCount(self) -> int:
+        return self.Container.FrameCount
+
+    @property
+    def FrameTime(self) -> float:
+        return self.Container.FrameTime
+
+    def __init__(self, path: str, sidecar: bool = True, memoryMap: bool = False, dtype: type = numpy.float64) -> None:
+        if not os.path.exists(path):
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+
+        self.Path = path
+        self.DType = numpy.dtype(dtype)
+        self.SidecarPath = f'{path}.idx' if sidecar else None
+        self._Index: Optional[numpy.ndarray] = None
+        self._Binary: Optional[BinaryIO] = None
+        self._File = open(path, "r")
+        try:
+            self.Container, self._Line = _parseHeader(self._File)
+        except BaseException:
+            self._File.close()
+            raise
+        self._MotionStart = self._File.tell()
+        self.Channels = sum(len(joint.Channels) for joint, _, _ in self.Root.layout())
+        self._Map: Optional[mmap.mmap] = None
+        if memoryMap:
+            self._Binary = open(self.Path, 'rb')
+            self._Map = mmap.mmap(self._Binary.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __repr__(self) -> str:
+        return f"BvhStream({self.Path}, {self.FrameCount} frames, {self.Channels} channels)"
+
+    def __enter__(self) -> "BvhStream":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.FrameCount
+
+    def __iter__(self) -> Iterator[numpy.ndarray]:
+        for chunk in self.chunks():
+            yield from chunk
+
+    @overload
+    def __getitem__(self, frame: int) -> numpy.ndarray: ...
+
+    @overload
+    def __getitem__(self, frame: slice) -> numpy.ndarray: ...
+
+    def __getitem__(self, frame: Union[int, slice]) -> numpy.ndarray:
+        if isinstance(frame, slice):
+            return self.read(*frame.indices(self.FrameCount))
+        if frame < -self.FrameCount or frame >= self.FrameCount:
+            raise IndexError('frame index out of range')
+        frame %= self.FrameCount
+        return self.read(frame, frame + 1)[0]
+
+    def close(self) -> None:
+        """Closes the underlying files."""
+        self._File.close()
+        if self._Map is not None:
+            self._Map.close()
+        if self._Binary is not None:
+            self._Binary.close()
+
+    def chunks(self, size: int = 1024, frames: Optional[int] = None) -> Iterator[numpy.ndarray]:
+        """Yields the motion from the first frame on in blocks of at most size frames as (frames, channels) arrays.
+        - If frames is set -> Only that many frames are read, otherwise all frames of the file.
+        - Blank lines in the motion block are skipped like by ``readAsBvh()``."""
+        if size < 1: raise ValueError('Chunk size must be at least 1')
+        frames = self.FrameCount if frames is None else min(frames, self.FrameCount)
+
+        self._File.seek(self._MotionStart)
+        rows = (line for line in self._File if line.strip())
+        for start in range(0, frames, size):
+            count = min(size, frames - start)
+            lines = list(islice(rows, count))
+            yield _deserializeMotionBlock(lines, self._Line + start, count, self.Channels, dtype=self.DType)
+
+    def read(self, start: int, stop: int, step: int = 1) -> numpy.ndarray:
+        """Decodes the frames of the range [start:stop:step] as (frames, channels) array, using the frame index to seek to them."""
+        frames = range(start, stop, step)
+        if len(frames) == 0:
+            return numpy.zeros((0, self.Channels), dtype=self.DType)
+
+        index = self.getIndex()
+        first, last = min(frames[0], frames[-1]), max(frames[0], frames[-1])
+        if self._Map is not None:
+            data = self._Map[index[first]:index[last + 1]]
+        else:
+            if self._Binary is None:
+                self._Binary = open(self.Path, 'rb')
+            self._Binary.seek(index[first])
+            data = self._Binary.read(index[last + 1] - index[first])
+
+        lines = [line for line in data.decode().splitlines() if line.strip()][frames[0] - first::step]
+        return _deserializeMotionBlock(lines, self._Line + frames[0], len(frames), self.Channels, dtype=self.DType)
+
+    def getIndex(self) -> numpy.ndarray:
+        """Byte offsets of all frames in the file, followed by the end offset of the last frame.
+        - Loaded from the sidecar file if it matches the current file, otherwise built and stored."""
+        if self._Index is None:
+            stat = os.stat(self.Path)
+            self._Index = _loadFrameIndex(self.SidecarPath, stat) if self.SidecarPath else None
+            if self._Index is None or len(self._Index) != self.FrameCount + 1:
+                self._Index = _buildFrameIndex(self.Path, self._MotionStart, self.FrameCount)
+                if self.SidecarPath: _saveFrameIndex(self.SidecarPath, stat, self._Index)
+        return self._Index
+
+
+_IndexBlockSize = 1 << 24
+
+
+def _buildFrameIndex(path: str, motionStart: int, frames: int) -> numpy.ndarray:
+    """Scans the file for line breaks from the start of the motion on and returns the offsets of the first lines.
+    - Blank or whitespace-only lines are skipped, so they do not shift the offsets of the following frames."""
+    starts: list[numpy.ndarray] = []
+    ends: list[numpy.ndarray] = []
+    found = 0
+    with open(path, 'rb') as file:
+        file.seek(motionStart)
+        position = motionStart
+        rest = b''
+        while found < frames:
+            block = file.read(_IndexBlockSize)
+            data = rest + block
+            if block:
+                # a line crossing the end of the block is completed by the next one
+                cut = data.rfind(b'\n') + 1
+                data, rest = data[:cut], data[cut:]
+            elif not data:
+                break
+            lineStarts, lineEnds = _findFilledLines(data, position)
+            starts.append(lineStarts)
+            ends.append(lineEnds)
+            found += len(lineStarts)
+            position += len(data)
+            if not block:
+                break
+
+    found = min(found, frames)
+    if found != frames:
+        raise SyntaxError(f'Frame count mismatch, expected {frames} keyframes but found {found}', (path, 0, 0, ''))
+    if frames == 0:
+        return numpy.array([motionStart], dtype=numpy.int64)
+    return numpy.append(numpy.concatenate(starts)[:frames], numpy.concatenate(ends)[frames - 1]).astype(numpy.int64)
+
+
+_Whitespace = numpy.frombuffer(b' \t\r\n\v\f', dtype=numpy.uint8)
+
+
+def _findFilledLines(data: bytes, position: int) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """Returns the start and end offsets of the lines in data that contain other characters than whitespace."""
+    if not data:
+        return numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64)
+    array = numpy.frombuffer(data, dtype=numpy.uint8)
+    ends = numpy.flatnonzero(array == ord('\n')) + 1
+    if len(ends) == 0 or ends[-1] != len(array):
+        # last line without line break at the end of the file
+        ends = numpy.append(ends, len(array))
+    starts = numpy.concatenate([[0], ends[:-1]])
+    filled = numpy.logical_or.reduceat(~numpy.isin(array, _Whitespace), starts)
+    return starts[filled] + position, ends[filled] + position
+
+
+def _loadFrameIndex(path: str, stat: os.stat_result) -> Optional[numpy.ndarray]:
+    try:
+        with open(path, 'rb') as file, numpy.load(file) as data:
+            if int(data['size']) == stat.st_size and int(data['mtime']) == stat.st_mtime_ns:
+                return data['offsets']
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        pass
+    return None
+
+
+def _saveFrameIndex(path: str, stat: os.stat_result, offsets: numpy.ndarray) -> None:
+    """Stores the index like ``Cache.writeCache()``, the sidecar is replaced atomically so readers never see a partial file."""
+    try:
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    except OSError:
+        return
+    try:
+        with os.fdopen(handle, 'wb') as file:
+            numpy.savez(file, offsets=offsets, size=stat.st_size, mtime=stat.st_mtime_ns)
+        os.replace(temporary, path)
+    except OSError:
+        if os.path.exists(temporary): os.remove(temporary)
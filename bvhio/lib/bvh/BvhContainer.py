@@ -1,4 +1,7 @@
+import numpy
 from .BvhJoint import BvhJoint
+from .BvhKeyframes import BvhKeyframes
+from .. import Batch
 from typing import Optional
 
 
@@ -9,12 +12,61 @@ class BvhContainer:
 
     Frame time the frame time.
 
-    Frams are the count of keyframes of the motion."""
+    Frams are the count of keyframes of the motion.
+
+    Motion is the optional raw motion data as (frames, channels) matrix, if the file was read as columnar.
+    The keyframes of the joints are then views into this matrix."""
     Root: BvhJoint
     FrameCount: int
     FrameTime: float
+    Motion: Optional[numpy.ndarray]
 
-    def __init__(self, root: Optional[BvhJoint] = None, frameCount: Optional[int] = None, frameTime: Optional[float] = None):
+    def __init__(self, root: Optional[BvhJoint] = None, frameCount: Optional[int] = None, frameTime: Optional[float] = None, motion: Optional[numpy.ndarray] = None):
         self.Root = root if root is not None else BvhJoint("Root")
         self.FrameCount = frameCount if frameCount is not None else 0
         self.FrameTime = frameTime if frameTime is not None else 0
+        self.Motion = motion
+
+    def resample(self, frameTime: float, spherical: bool = True) -> "BvhContainer":
+        """Resamples the motion of all joints to the given frame time and updates FrameCount and FrameTime.
+        - The duration of the motion is kept, frames in between the current frames are interpolated.
+        - Positions are linearly interpolated, rotations spherically if spherical is True, otherwise linearly.
+        - If the motion is columnar -> A new motion matrix of the same dtype is created and the keyframes become views into it, otherwise lists of poses.
+
+        Returns itself."""
+        if self.FrameCount == 0:
+            self.FrameTime = frameTime
+            return self
+
+        _, sources = Batch.retime(0, max(self.FrameCount - 1, 0), self.FrameTime, frameTime)
+        joints = [joint for joint, _, _ in self.Root.layout()]
+
+        columns: list[numpy.ndarray] = []
+        for joint in joints:
+            positions, rotations = joint.getKeyframeArrays()
+            if len(positions) == 0:
+                raise ValueError(f'Joint "{joint.Name}" has no keyframes to resample')
+            before = numpy.clip(numpy.floor(sources).astype(numpy.int64), 0, len(positions) - 1)
+            after = numpy.clip(before + 1, 0, len(positions) - 1)
+            weight = numpy.clip(sources - before, 0, 1)
+
+            positions = positions[before] * (1 - weight[:, None]) + positions[after] * weight[:, None]
+            if spherical:
+                rotations = Batch.quatSlerp(rotations[before], rotations[after], weight)
+            else:
+                rotations = rotations[before] * (1 - weight[:, None]) + rotations[after] * weight[:, None]
+            columns.extend(BvhKeyframes.encode(positions, rotations, joint.Channels))
+
+        dtype = self.Motion.dtype if self.Motion is not None else numpy.float64
+        motion = numpy.stack(columns, axis=1).astype(dtype, copy=False) if columns else numpy.zeros((len(sources), 0), dtype=dtype)
+        columnar = self.Motion is not None
+        index = 0
+        for joint in joints:
+            keyframes = BvhKeyframes(motion, index, joint.Channels, joint.Offset)
+            joint.Keyframes = keyframes if columnar else keyframes.toList()
+            index = keyframes.Columns.stop
+
+        self.Motion = motion if columnar else None
+        self.FrameCount = len(sources)
+        self.FrameTime = frameTime
+        return self
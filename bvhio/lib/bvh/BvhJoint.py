@@ -1,18 +1,20 @@
 import glm
+import numpy
 from SpatialTransform import Pose
-from typing import Optional, cast
+from typing import Optional, Union, cast
+from .BvhKeyframes import BvhKeyframes
+from .CompactPose import CompactPose
 
 
-class BvhJoint:
-    """Data structure for the bvh skeleton definition. Contains the attributes as in the BVH file.
-
-    Keyframes contain the motion data."""
+class _BvhJointBase:
+    """Attributes and methods shared by ``BvhJoint`` and ``CompactBvhJoint``. Declares no slots, so subclasses decide about the instance layout."""
+    __slots__ = ()
     Name: str
     Offset: glm.vec3
     EndSite: Optional[glm.vec3]
-    Keyframes: list[Pose]
+    Keyframes: Union[list[Pose], list[CompactPose], BvhKeyframes]
     Channels: list[str]
-    Children: list["BvhJoint"]
+    Children: list["_BvhJointBase"]
 
     def __init__(self, name: str, offset: Optional[glm.vec3]  = None) -> None:
         self.Name = name
@@ -28,6 +30,14 @@ class BvhJoint:
     def __str__(self) -> str:
         return self.__repr__()
 
+    def getKeyframeArrays(self) -> tuple[numpy.ndarray, numpy.ndarray]:
+        """Returns positions as (frames, 3) and rotations as (frames, 4) array of the keyframes."""
+        if isinstance(self.Keyframes, BvhKeyframes):
+            return (self.Keyframes.getPositions(), self.Keyframes.getRotations())
+        positions = numpy.array([key.Position.to_list() for key in self.Keyframes], dtype=float).reshape(-1, 3)
+        rotations = numpy.array([key.Rotation.to_list() for key in self.Keyframes], dtype=float).reshape(-1, 4)
+        return (positions, rotations)
+
     def getTip(self) -> glm.vec3:
         """Calculates the tip of the defined bone.
 
@@ -61,9 +71,32 @@ class BvhJoint:
         if dot > +0.9999: return glm.quat(1, 0, 0, 0)
         return glm.angleAxis(glm.acos(dot), glm.normalize(glm.cross(axs, dir)))
 
-    def layout(self, index: int = 0, depth: int = 0) -> list[tuple["BvhJoint", int, int]]:
+    def layout(self, index: int = 0, depth: int = 0) -> list[tuple["_BvhJointBase", int, int]]:
         """Returns the hierarchical layout of this joint and its children recursivly."""
-        result: list[tuple["BvhJoint", int, int]] = [(self, index, depth)]
+        result: list[tuple["_BvhJointBase", int, int]] = [(self, index, depth)]
         for child in self.Children:
             result.extend(child.layout(result[-1][1] + 1, depth + 1))
         return result
+
+
+class BvhJoint(_BvhJointBase):
+    """Data structure for the bvh skeleton definition. Contains the attributes as in the BVH file.
+
+    Keyframes contain the motion data, either as list of poses or as lazy view into the motion matrix of the container."""
+
+
+class CompactBvhJoint(_BvhJointBase):
+    """Same as ``BvhJoint``, but the attributes are stored in slots instead of a per-instance dictionary.
+    - Needs less memory for large skeleton libraries, see ``readAsBvh(compact=True)``.
+    - Other attributes than the ones of ``BvhJoint`` can not be set."""
+    __slots__ = ('Name', 'Offset', 'EndSite', 'Keyframes', 'Channels', 'Children')
+
+    @classmethod
+    def fromJoint(cls, joint: _BvhJointBase) -> "CompactBvhJoint":
+        """Creates a compact copy of the joint and its children. Channels and keyframes are shared with the given joints."""
+        compact = cls(joint.Name, joint.Offset)
+        compact.EndSite = joint.EndSite
+        compact.Keyframes = joint.Keyframes
+        compact.Channels = joint.Channels
+        compact.Children = [cls.fromJoint(child) for child in joint.Children]
+        return compact
@@ -0,0 +1,157 @@
+import glm
+import numpy
+from collections.abc import MutableSequence
+from SpatialTransform import Pose
+from .. import Batch
+from .CompactPose import CompactPose
+from typing import Optional, Union, overload
+
+
+class BvhKeyframes(MutableSequence):
+    """Lazy list of keyframes of a single joint, backed by the motion matrix of a bvh container.
+
+    Columns is the column map of the joint into the motion matrix. Channels and Offset are the joint values at the time of reading,
+    so the motion can still be decoded if the joint channels are changed afterwards.
+
+    Poses are only created when accessed and are copies, so changing a returned pose does not change the motion.
+    Any modification of the list itself converts it once into a plain list of poses."""
+    Motion: numpy.ndarray
+    Columns: slice
+    Channels: tuple[str, ...]
+    Offset: glm.vec3
+    _Poses: Optional[list[Pose]]
+
+    def __init__(self, motion: numpy.ndarray, start: int, channels: list[str], offset: glm.vec3) -> None:
+        self.Channels = tuple(channels)
+        self.Offset = glm.vec3(offset)
+        self._Poses = None
+
+        self._PositionColumns: list[tuple[int, int]] = []
+        self._RotationColumns: list[tuple[int, int]] = []
+        self._RotationOrder = ''
+        index = start
+        for channel in self.Channels:
+            if 'Xposition' == channel: self._PositionColumns.append((0, index))
+            elif 'Yposition' == channel: self._PositionColumns.append((1, index))
+            elif 'Zposition' == channel: self._PositionColumns.append((2, index))
+            elif 'Xrotation' == channel: self._RotationColumns.append((0, index)); self._RotationOrder += 'X'
+            elif 'Yrotation' == channel: self._RotationColumns.append((1, index)); self._RotationOrder += 'Y'
+            elif 'Zrotation' == channel: self._RotationColumns.append((2, index)); self._RotationOrder += 'Z'
+            else: index -= 1
+            index += 1
+
+        self.Motion = motion
+        self.Columns = slice(start, index)
+
+    def __repr__(self) -> str:
+        return f"BvhKeyframes({len(self)} frames, columns {self.Columns.start}:{self.Columns.stop})"
+
+    def __len__(self) -> int:
+        return len(self._Poses) if self._Poses is not None else self.Motion.shape[0]
+
+    @overload
+    def __getitem__(self, index: int) -> Pose: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Pose]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Pose, list[Pose]]:
+        if self._Poses is not None:
+            return self._Poses[index]
+        if isinstance(index, slice):
+            return [self._decode(frame) for frame in range(*index.indices(len(self)))]
+        if index < -len(self) or index >= len(self):
+            raise IndexError('keyframe index out of range')
+        return self._decode(index % len(self))
+
+    def __setitem__(self, index, value) -> None:
+        self.toList()[index] = value
+
+    def __delitem__(self, index) -> None:
+        del self.toList()[index]
+
+    def insert(self, index: int, value: Pose) -> None:
+        self.toList().insert(index, value)
+
+    def isColumnar(self) -> bool:
+        """True as long as the keyframes are read from the motion matrix and not converted to a list of poses yet."""
+        return self._Poses is None
+
+    def toList(self) -> list[Pose]:
+        """Converts the view once into a plain list of poses, which is used from then on instead of the motion matrix."""
+        if self._Poses is None:
+            self._Poses = [Pose(glm.vec3(*position), glm.quat(*rotation)) for position, rotation in zip(self.getPositions().tolist(), self.getRotations().tolist())]
+        return self._Poses
+
+    def toCompact(self) -> list[CompactPose]:
+        """Decodes all keyframes into compact records, which need less memory than poses. The view itself is not converted."""
+        if self._Poses is not None:
+            return [CompactPose(pose.Position, pose.Rotation) for pose in self._Poses]
+        return [CompactPose(glm.vec3(*position), glm.quat(*rotation)) for position, rotation in zip(self.getPositions().tolist(), self.getRotations().tolist())]
+
+    def getChannelColumns(self, channels: list[str]) -> Optional[list[int]]:
+        """Columns of the motion matrix that hold the values of the given channels.
+        - If the channels equal the channels of the view -> All columns of the view are returned.
+        - If a channel is missing or the rotation channels result in another rotation order -> None is returned, the values must be converted."""
+        if tuple(channels) == self.Channels:
+            return list(range(self.Columns.start, self.Columns.stop))
+
+        index = {channel: column for column, channel in enumerate(channel for channel in self.Channels if channel[1:] in ('position', 'rotation'))}
+        if any(channel not in index for channel in channels):
+            return None
+
+        # rotations are written in the order of the channels, missing axes are appended like in the writer
+        order = ''.join([channel[0] for channel in channels if channel[1:] == 'rotation'])
+        if order:
+            for axis in 'ZXY':
+                if axis not in order: order += axis
+            if order != self._RotationOrder:
+                return None
+        return [self.Columns.start + index[channel] for channel in channels]
+
+    @staticmethod
+    def encode(positions: numpy.ndarray, rotations: numpy.ndarray, channels: list[str]) -> list[numpy.ndarray]:
+        """Converts (frames, 3) positions and (frames, 4) rotations into one column of values per channel.
+        - Rotations are converted into euler angles in the order of the rotation channels, missing axes are appended in ZXY order."""
+        order = ''.join([channel[0] for channel in channels if channel[1:] == 'rotation'])
+        for axis in 'ZXY':
+            if axis not in order: order += axis
+        eulers = Batch.quatToEuler(rotations, order, extrinsic=False)
+
+        result = []
+        for channel in channels:
+            if 'Xposition' == channel: result.append(positions[:, 0]); continue
+            if 'Yposition' == channel: result.append(positions[:, 1]); continue
+            if 'Zposition' == channel: result.append(positions[:, 2]); continue
+            if 'Xrotation' == channel: result.append(eulers[:, 0]); continue
+            if 'Yrotation' == channel: result.append(eulers[:, 1]); continue
+            if 'Zrotation' == channel: result.append(eulers[:, 2]); continue
+        return result
+
+    def getPositions(self) -> numpy.ndarray:
+        """Positions of all frames as (frames, 3) array. Missing position channels are filled with the offset."""
+        if self._Poses is not None:
+            return numpy.array([pose.Position.to_list() for pose in self._Poses], dtype=float).reshape(-1, 3)
+        return self._decodePositions(self.Motion)
+
+    def getRotations(self) -> numpy.ndarray:
+        """Rotations of all frames as (frames, 4) quaternion array, converted at once from the euler channels."""
+        if self._Poses is not None:
+            return numpy.array([pose.Rotation.to_list() for pose in self._Poses], dtype=float).reshape(-1, 4)
+        return self._decodeRotations(self.Motion)
+
+    def _decodePositions(self, motion: numpy.ndarray) -> numpy.ndarray:
+        positions = numpy.tile(numpy.array(self.Offset, dtype=motion.dtype), (motion.shape[0], 1))
+        for axis, column in self._PositionColumns:
+            positions[:, axis] = motion[:, column]
+        return positions
+
+    def _decodeRotations(self, motion: numpy.ndarray) -> numpy.ndarray:
+        eulers = numpy.zeros((motion.shape[0], 3), dtype=motion.dtype)
+        for axis, column in self._RotationColumns:
+            eulers[:, axis] = motion[:, column]
+        return Batch.eulerToQuat(eulers, order=self._RotationOrder, extrinsic=False)
+
+    def _decode(self, frame: int) -> Pose:
+        rows = self.Motion[frame:frame + 1]
+        return Pose(glm.vec3(*self._decodePositions(rows)[0].tolist()), glm.quat(*self._decodeRotations(rows)[0].tolist()))
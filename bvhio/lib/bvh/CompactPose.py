@@ -0,0 +1,29 @@
+import glm
+from SpatialTransform import Pose
+from typing import Optional
+
+
+class CompactPose:
+    """Lightweight keyframe record of a bvh joint with only a local position and rotation.
+
+    It has the same Position and Rotation properties as ``Pose``, but no scale, spaces or parent,
+    so a keyframe needs less than half of the memory of a ``Pose``."""
+    __slots__ = ('Position', 'Rotation')
+    Position: glm.vec3
+    Rotation: glm.quat
+
+    def __init__(self, position: Optional[glm.vec3] = None, rotation: Optional[glm.quat] = None) -> None:
+        self.Position = glm.vec3() if position is None else glm.vec3(position)
+        self.Rotation = glm.quat() if rotation is None else glm.quat(rotation)
+
+    def __repr__(self) -> str:
+        return f"CompactPose(Position: {self.Position}, Rotation: {self.Rotation})"
+
+    @property
+    def Scale(self) -> glm.vec3:
+        """Bvh keyframes have no scale, so it is always one."""
+        return glm.vec3(1)
+
+    def toPose(self) -> Pose:
+        """Creates a full pose with the properties of this record."""
+        return Pose(glm.vec3(self.Position), glm.quat(self.Rotation))
@@ -1,2 +1,4 @@
 from .BvhContainer import BvhContainer
-from .BvhJoint import BvhJoint
+from .BvhJoint import BvhJoint, CompactBvhJoint
+from .BvhKeyframes import BvhKeyframes
+from .CompactPose import CompactPose
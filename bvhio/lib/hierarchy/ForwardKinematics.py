@@ -0,0 +1,111 @@
+from typing import TYPE_CHECKING, Optional, Union
+
+import numpy
+
+from .. import Batch
+
+if TYPE_CHECKING:
+    from .Joint import Joint
+
+
+class ForwardKinematics:
+    """Evaluates the animation of a joint hierarchy for many frames at once.
+
+    The result is the same as calling ``loadPose(frame)`` on the root and reading the world properties of every joint,
+    but all frames and joints are computed with array operations instead of walking the parent chains.
+
+    The rest poses and keyframes are copied when the engine is created, so it does not see later changes of the hierarchy.
+    The world space of the parent of the root joint is included as it is at creation time.
+
+    Arrays are indexed by ``[frame, joint]`` with the joints in the order of ``Joints``, which is the order of ``root.layout()``.
+    If only some joints are given, only those are evaluated and the arrays follow their order instead.
+    Quaternions are stored as (w, x, y, z) and matrices like ``numpy.array(joint.SpaceWorld)``.
+    All arrays are computed and returned in DType, so ``numpy.float32`` halves the memory of the results."""
+    Joints: list["Joint"]
+    Names: list[str]
+    Parents: numpy.ndarray
+    Frames: range
+    DType: numpy.dtype
+
+    def __init__(self, root: "Joint", joints: Optional[list["Joint"]] = None, dtype: type = numpy.float64) -> None:
+        """Creates the engine for the root and all its children.
+        - If joints is given -> Only these joints are evaluated. The root must come first and every other joint after its parent.
+        - dtype is the float type of all computed arrays."""
+        self.DType = numpy.dtype(dtype)
+        self.Joints = [joint for joint, _, _ in root.layout()] if joints is None else list(joints)
+        self.Names = [joint.Name for joint in self.Joints]
+        index = {id(joint): i for i, joint in enumerate(self.Joints)}
+        self.Parents = numpy.array([index.get(id(joint.Parent), -1) for joint in self.Joints], dtype=numpy.int64)
+        if joints is not None:
+            if not self.Joints or self.Joints[0] is not root:
+                raise ValueError('the first joint must be the root')
+            if any(parent < 0 or parent >= i for i, parent in enumerate(self.Parents.tolist()) if i > 0):
+                raise ValueError('every joint must come after its parent')
+
+        start, end = root.getKeyframeRange(includeChildren=True)
+        self.Frames = range(start, end + 1)
+
+        self._RestPositions = numpy.array([joint.RestPose.Position.to_list() for joint in self.Joints], dtype=self.DType)
+        self._RestRotations = numpy.array([joint.RestPose.Rotation.to_list() for joint in self.Joints], dtype=self.DType)
+        self._RestScales = numpy.array([joint.RestPose.Scale.to_list() for joint in self.Joints], dtype=self.DType)
+        self._Tracks = [joint.Keyframes.copy() for joint in self.Joints]
+
+        base = root.Parent.SpaceWorld if root.Parent is not None else None
+        self._BaseMatrix = numpy.array(base, dtype=self.DType) if base is not None else numpy.identity(4, dtype=self.DType)
+        self._BaseRotation = numpy.array(root.Parent.RotationWorld.to_list() if root.Parent is not None else [1.0, 0, 0, 0], dtype=self.DType)
+        self._BaseScale = numpy.array(root.Parent.ScaleWorld.to_list(), dtype=self.DType) if root.Parent is not None else numpy.ones(3, dtype=self.DType)
+
+    def __repr__(self) -> str:
+        return f"ForwardKinematics({len(self.Joints)} joints, frames {self.Frames.start}:{self.Frames.stop})"
+
+    def getLocalPoses(self, frames: Optional[Union[range, list[int], numpy.ndarray]] = None) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """Returns the local positions (frames, joints, 3), rotations (frames, joints, 4) and scales (frames, joints, 3)
+        that ``loadPose()`` writes into the joint properties, so ``Pose = RestPose + Keyframe``.
+        - If frames is None -> All frames of the keyframe range of the hierarchy are evaluated.
+        - Frames between two keyframes are linearly interpolated, frames out of the keyframe range use the nearest keyframe."""
+        frames = numpy.asarray(self.Frames if frames is None else frames, dtype=float).reshape(-1)
+        keyPositions = numpy.empty((len(frames), len(self.Joints), 3), dtype=self.DType)
+        keyRotations = numpy.empty((len(frames), len(self.Joints), 4), dtype=self.DType)
+        keyScales = numpy.empty((len(frames), len(self.Joints), 3), dtype=self.DType)
+        for j, track in enumerate(self._Tracks):
+            keyPositions[:, j], keyRotations[:, j], keyScales[:, j] = track.sample(frames)
+
+        restMatrices = _toMatrix(self._RestRotations)
+        positions = self._RestPositions + self._RestScales * numpy.einsum('jab,fjb->fja', restMatrices, keyPositions)
+        rotations = Batch.quatMul(self._RestRotations, keyRotations)
+        scales = self._RestScales * keyScales
+        return (positions, rotations, scales)
+
+    def evaluate(self, frames: Optional[Union[range, list[int], numpy.ndarray]] = None, matrices: bool = False) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, Optional[numpy.ndarray]]:
+        """Returns the world positions (frames, joints, 3), rotations (frames, joints, 4) and scales (frames, joints, 3) of all joints.
+        - If matrices is True -> The world spaces are returned as (frames, joints, 4, 4) matrices as fourth element, otherwise it is None.
+        - If frames is None -> All frames of the keyframe range of the hierarchy are evaluated."""
+        positions, rotations, scales = self.getLocalPoses(frames)
+
+        # linear part of the local spaces, which are composed as 'T * S * R'
+        linears = scales[..., :, None] * _toMatrix(rotations)
+        for j, parent in enumerate(self.Parents.tolist()):
+            if parent < 0:
+                parentLinear, parentPosition = self._BaseMatrix[:3, :3], self._BaseMatrix[:3, 3]
+                parentRotation, parentScale = self._BaseRotation, self._BaseScale
+            else:
+                parentLinear, parentPosition = linears[:, parent], positions[:, parent]
+                parentRotation, parentScale = rotations[:, parent], scales[:, parent]
+
+            positions[:, j] = parentPosition + numpy.einsum('...ab,...b->...a', parentLinear, positions[:, j])
+            rotations[:, j] = Batch.quatMul(parentRotation, rotations[:, j])
+            scales[:, j] = parentScale * scales[:, j]
+            linears[:, j] = parentLinear @ linears[:, j]
+
+        result = None
+        if matrices:
+            result = numpy.zeros(linears.shape[:-2] + (4, 4), dtype=self.DType)
+            result[..., :3, :3] = linears
+            result[..., :3, 3] = positions
+            result[..., 3, 3] = 1
+        return (positions, rotations, scales, result)
+
+
+def _toMatrix(quats: numpy.ndarray) -> numpy.ndarray:
+    """Rotation matrices of the quaternions, indexed as ``[row, column]``."""
+    return numpy.swapaxes(Batch.quatToMat(quats), -1, -2)
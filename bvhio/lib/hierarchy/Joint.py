@@ -1,7 +1,34 @@
-from typing import Optional, cast, Self
+from typing import Iterable, Optional, Union, cast, Self
 import glm
-import bisect
+import numpy
 from SpatialTransform import Transform, Pose
+from .ForwardKinematics import ForwardKinematics
+from .KeyframeTrack import KeyframeTrack
+from .. import Batch
+
+
+class WorldCacheCounters:
+    """Counts the lookups of cached world space properties of all joints."""
+    Hits: int
+    Misses: int
+
+    @property
+    def HitRate(self) -> float:
+        """Share of lookups served from the cache, 0 if there were no lookups yet."""
+        lookups = self.Hits + self.Misses
+        return self.Hits / lookups if lookups > 0 else 0.0
+
+    def __init__(self) -> None:
+        self.Hits = 0
+        self.Misses = 0
+
+    def __repr__(self) -> str:
+        return f"WorldCacheCounters({self.Hits} hits, {self.Misses} misses)"
+
+    def reset(self) -> None:
+        """Sets the counters back to 0."""
+        self.Hits = 0
+        self.Misses = 0
 
 
 class Joint(Transform):
@@ -11,20 +38,120 @@ class Joint(Transform):
     - Positive rotations are counter clockwise.
     - The animation is a cualculation of ``Pose = RestPose + Keyframe``
     - The RestPose and Keyframe data is in local space only.
-    - The method ``readPose()`` combines the RestPose and Keframes."""
+    - The method ``readPose()`` combines the RestPose and Keframes.
+    - World space properties are cached until a local property of the joint or one of its parents changes.
+      ``Joint.WorldCache`` counts the cache hits and misses of all joints."""
 
+    WorldCache = WorldCacheCounters()
 
-    _Parent: Optional["Joint"]  = None
+    _ParentJoint: Optional["Joint"] = None
     _Children: list["Joint"] = []
     _RestPose: Transform
-    _Keyframes: list[tuple[int, Transform]] = []
-    _KeyframeMap: dict[int, Transform]
+    _Keyframes: KeyframeTrack
     _CurrentFrame:int = -1
+    _SpaceWorldCache: Optional[glm.mat4] = None
+    _RotationWorldCache: Optional[glm.quat] = None
+    _ScaleWorldCache: Optional[glm.vec3] = None
 
     @property
     def Parent(self) -> Optional["Joint"]:
         return self._Parent
 
+    @property
+    def _Parent(self) -> Optional["Joint"]:
+        return self._ParentJoint
+
+    @_Parent.setter
+    def _Parent(self, value: Optional["Joint"]) -> None:
+        self._ParentJoint = value
+        self._invalidateWorld()
+
+    @property
+    def _Position(self) -> glm.vec3:
+        return self._LocalPosition
+
+    @_Position.setter
+    def _Position(self, value: glm.vec3) -> None:
+        self._LocalPosition = value
+        self._invalidateWorld()
+
+    @property
+    def _Rotation(self) -> glm.quat:
+        return self._LocalRotation
+
+    @_Rotation.setter
+    def _Rotation(self, value: glm.quat) -> None:
+        self._LocalRotation = value
+        self._invalidateWorld()
+
+    @property
+    def _Scale(self) -> glm.vec3:
+        return self._LocalScale
+
+    @_Scale.setter
+    def _Scale(self, value: glm.vec3) -> None:
+        self._LocalScale = value
+        self._invalidateWorld()
+
+    @property
+    def SpaceWorld(self) -> glm.mat4:
+        """Transform space with respect to the parent."""
+        if self._SpaceWorldCache is not None:
+            self.WorldCache.Hits += 1
+            return glm.mat4(self._SpaceWorldCache)
+
+        self.WorldCache.Misses += 1
+        parent = self._ParentJoint
+        space = (parent.SpaceWorld if parent is not None else glm.mat4()) * self.Space
+        if parent is None or getattr(parent, '_SpaceWorldCache', None) is not None:
+            self._SpaceWorldCache = space
+        return glm.mat4(space)
+
+    @property
+    def RotationWorld(self) -> glm.quat:
+        """World rotation of the space."""
+        if self._RotationWorldCache is not None:
+            self.WorldCache.Hits += 1
+            return glm.quat(self._RotationWorldCache)
+
+        self.WorldCache.Misses += 1
+        parent = self._ParentJoint
+        rotation = (parent.RotationWorld if parent is not None else glm.quat()) * self.Rotation
+        if parent is None or getattr(parent, '_RotationWorldCache', None) is not None:
+            self._RotationWorldCache = rotation
+        return glm.quat(rotation)
+
+    @RotationWorld.setter
+    def RotationWorld(self, value: glm.quat) -> None:
+        Transform.RotationWorld.fset(self, value)
+
+    @property
+    def ScaleWorld(self) -> glm.vec3:
+        """World scale of the space."""
+        if self._ScaleWorldCache is not None:
+            self.WorldCache.Hits += 1
+            return glm.vec3(self._ScaleWorldCache)
+
+        self.WorldCache.Misses += 1
+        parent = self._ParentJoint
+        scale = (parent.ScaleWorld if parent is not None else glm.vec3(1)) * self.Scale
+        if parent is None or getattr(parent, '_ScaleWorldCache', None) is not None:
+            self._ScaleWorldCache = scale
+        return glm.vec3(scale)
+
+    @ScaleWorld.setter
+    def ScaleWorld(self, value: glm.vec3) -> None:
+        Transform.ScaleWorld.fset(self, value)
+
+    def _invalidateWorld(self) -> None:
+        """Clears the cached world space properties of this joint and its children.
+        - Children of a joint without cached properties have none either, so the recursion stops there."""
+        if self._SpaceWorldCache is None and self._RotationWorldCache is None and self._ScaleWorldCache is None:
+            return
+        self._SpaceWorldCache = self._RotationWorldCache = self._ScaleWorldCache = None
+        for child in self._Children:
+            child._invalidateWorld()
+
     @property
     def Children(self) -> list["Joint"]:
         return self._Children
@@ -35,19 +162,19 @@ class Joint(Transform):
         return self._CurrentFrame
 
     @property
-    def Keyframes(self) -> list[tuple[int, Transform]]:
+    def Keyframes(self) -> KeyframeTrack:
         """Animation data for the joint. A keyframe holds the change of local properties in relation to the rest pose, so that ``Pose = RestPose + Keyframe``.
     - The first element in the tuple is the frame id and the second element are the local keyframe properties.
-    - This is an ordered list by the frame id.
+    - This is an ordered sequence by the frame id, stored as arrays. The key transforms are only created when accessed.
     - Negative frame ids should not exist."""
         return self._Keyframes
 
     @Keyframes.setter
-    def Keyframes(self, value: list[tuple[int, Transform]]) -> None:
-        self._Keyframes = list(value)
-        self._KeyframeMap = {frame: key for frame, key in self._Keyframes}
-        self.RestPose.clearChildren(keep=[])
-        self.RestPose.attach(*[key for frame, key in value], keep=[])
+    def Keyframes(self, value: Union[KeyframeTrack, Iterable[tuple[int, Pose]]]) -> None:
+        if isinstance(value, KeyframeTrack):
+            self._Keyframes = value.copy(restPose=self.RestPose)
+        else:
+            self._Keyframes = KeyframeTrack.fromPoses(value, restPose=self.RestPose)
 
     @property
     def RestPose(self) -> Transform:
@@ -57,6 +184,7 @@ class Joint(Transform):
     @RestPose.setter
     def RestPose(self, value: Pose) -> None:
         self._RestPose = cast(Transform, value.duplicate())
+        self._Keyframes.RestPose = self._RestPose
 
     def __init__(
             self, name: str = "",
@@ -64,30 +192,17 @@ class Joint(Transform):
             rotation: glm.quat = glm.quat(),
             scale: glm.vec3 = glm.vec3(1),
             restPose: Optional[Transform] = None,
-            keyFrames: Optional[list[tuple[int, Transform]]] = None) -> None:
+            keyFrames: Optional[Union[KeyframeTrack, Iterable[tuple[int, Pose]]]] = None) -> None:
 
         super().__init__(name, position, rotation, scale)
         self._Parent = None
         self._Children = []
 
         self._RestPose: Transform = Transform(name='RestPose') if restPose is None else restPose
-        self._Keyframes: list[tuple[int, Transform]] = [] if keyFrames is None else keyFrames
-        self._KeyframeMap = {frame: key for frame, key in self._Keyframes}
+        self._Keyframes = KeyframeTrack(restPose=self._RestPose)
+        if keyFrames is not None: self.Keyframes = keyFrames
         self._CurrentFrame = -1
 
-    def __findFrameIndex(self, frame: int):
-        if not self.Keyframes:
-            return 0
-
-        if frame > self.Keyframes[-1][0]:
-            return len(self.Keyframes)
-
-        return bisect.bisect_left([key[0] for key in self.Keyframes], frame)
-
-    def __insertKeyframe(self, frame: int, key: Transform) -> None:
-        bisect.insort(self.Keyframes, (frame, key))
-        self._KeyframeMap[frame] = key
-
     def getKeyframe(self, frame: int) -> Transform:
         """Returns the pose at the given frame id.
         - If the frame number is negative, it will look for the n-th frame from the end.
@@ -102,38 +217,68 @@ class Joint(Transform):
         if frame < 0:
             frame = max(0, self.getKeyframeRange(includeChildren=False)[1] + 1 - frame)
 
-        existingFrame = self._KeyframeMap.get(frame)
-        if existingFrame:
-            return existingFrame
-
         # pose definition
-        index = self.__findFrameIndex(frame)
+        index = self.Keyframes.search(frame)
         if index == len(self.Keyframes):
             # index is bigger than last frame, take last key
             return self.Keyframes[-1][1]
-        elif self.Keyframes[index][0] == frame:
+        elif self.Keyframes.Frames[index] == frame:
             # index matches a keyframe
             return self.Keyframes[index][1]
         else:
             if index == 0:
                 # index is smaller than first frame, take first key
-                return self.Keyframes[-1][1]
+                return self.Keyframes[0][1]
             else:
                 # index is in between two keyframes, interpolate
-                before = self.Keyframes[index - 1]
-                after = self.Keyframes[index]
-                weight = (before[0] + frame) / after[0]
-
+                position, rotation, scale = self._sampleKeyframe(frame)
                 restPoseCopy = self.RestPose.duplicate(recursive=False).attach(
-                    Transform(
-                        name=f'Key {frame} (interpolated)',
-                        position=glm.lerp(before[1].Position, after[1].Position, weight),
-                        rotation=glm.lerp(before[1].Rotation, after[1].Rotation, weight),
-                        scale=glm.lerp(before[1].Scale, after[1].Scale, weight)
-                    ), keep=[]
-                )
+                    Transform(name=f'Key {frame} (interpolated)', position=position, rotation=rotation, scale=scale), keep=[])
                 return restPoseCopy.Children[0]
 
+    def _sampleKeyframe(self, frame: int) -> tuple[glm.vec3, glm.quat, glm.vec3]:
+        """Local keyframe properties at the frame id like ``getKeyframe()``, read directly from the keyframe arrays."""
+        keys = self.Keyframes
+        if len(keys) == 0:
+            return (glm.vec3(), glm.quat(), glm.vec3(1))
+
+        if frame < 0:
+            frame = max(0, self.getKeyframeRange(includeChildren=False)[1] + 1 - frame)
+
+        index = keys.search(frame)
+        if index == len(keys) or keys.Frames[index] == frame or index == 0:
+            index = min(index, len(keys) - 1)
+            return (glm.vec3(*keys.Positions[index].tolist()), glm.quat(*keys.Rotations[index].tolist()), glm.vec3(*keys.Scales[index].tolist()))
+
+        position, rotation, scale = keys.sample([frame])
+        return (glm.vec3(*position[0].tolist()), glm.quat(*rotation[0].tolist()), glm.vec3(*scale[0].tolist()))
+
+    def sampleKeyframes(self, frames: Union[range, list[float], numpy.ndarray], spherical: bool = True) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """Returns the local keyframe properties at many frame ids as (frames, 3) positions, (frames, 4) rotations and (frames, 3) scales.
+        - Frame ids may be fractional, positions and scales are linearly interpolated between the keyframes.
+        - If spherical is True -> Rotations are spherically interpolated, otherwise linearly like ``getKeyframe()``.
+        - If there are no keyframes -> The identity is returned.
+        - If the frame id is out of the keyframe length, the nearest keyframe propetires are used."""
+        return self.Keyframes.sample(frames, spherical=spherical)
+
+    def resample(self, frameTime: float, targetFrameTime: float, recursive: bool = True, spherical: bool = True) -> Self:
+        """Converts the keyframes from the frame time they were recorded with to the target frame time.
+        - Every frame of the target frame time within the keyframe range gets a keyframe, sampled like ``sampleKeyframes()``.
+        - Frame ids are scaled by the ratio of the frame times, so the duration of the animation is kept.
+        - If recursive is True -> All children are resampled to the same frames.
+        - Joints without keyframes are not changed.
+
+        Returns itself."""
+        start, end = self.getKeyframeRange(includeChildren=recursive)
+        frames, sources = Batch.retime(start, end, frameTime, targetFrameTime)
+
+        for joint in ([j for j, _, _ in self.layout()] if recursive else [self]):
+            if len(joint.Keyframes) == 0: continue
+            positions, rotations, scales = joint.Keyframes.sample(sources, spherical=spherical)
+            joint.Keyframes = KeyframeTrack(frames, positions, rotations, scales)
+
+        return self
+
     def setKeyframe(self, frame: int, pose: Transform, keep: Optional[list[str]] = None) -> Self:
         """Inserts the given pose to the the keyframes.
         - If there is already a keyframe at the frame id, it will be overwritten.
@@ -141,22 +286,50 @@ class Joint(Transform):
         - This pose is added later to the rest pose to calculate the final animation."""
         if keep is None: keep = ['position', 'rotation', 'scale']
         if frame < 0: frame = max(0, self.getKeyframeRange(includeChildren=False)[1] + 1 - frame)
-        index = self.__findFrameIndex(frame)
 
-        if index == len(self.Keyframes) or self.Keyframes[index][0] != frame:
-            newKey = Transform(name=f'Key {frame}', position=pose.Position, rotation=pose.Rotation, scale=pose.Scale)
-            self.__insertKeyframe(frame, newKey)
-            self.RestPose.attach(newKey, keep=keep)
-        else:
-            if 'position' in keep: self.Keyframes[index][1].PositionWorld = pose.Position
-            else: self.Keyframes[index][1].Position = pose.Position
-
-            if 'rotation' in keep: self.Keyframes[index][1].RotationWorld = pose.Rotation
-            else: self.Keyframes[index][1].Rotation = pose.Rotation
+        # keep the world space properties in relation to the rest pose
+        self.Keyframes.set(
+            frame,
+            self.RestPose.SpaceWorldInverse * pose.Position if 'position' in keep else pose.Position,
+            self.RestPose.RotationWorldInverse * pose.Rotation if 'rotation' in keep else pose.Rotation,
+            self.RestPose.ScaleWorldInverse * pose.Scale if 'scale' in keep else pose.Scale)
 
-            if 'scale' in keep: self.Keyframes[index][1].ScaleWorld = pose.Scale
-            else: self.Keyframes[index][1].Scale = pose.Scale
+        return self
 
+    def setKeyframes(
+            self,
+            frames: Union[list[int], numpy.ndarray, Iterable[tuple[int, Pose]]],
+            positions: Optional[numpy.ndarray] = None,
+            rotations: Optional[numpy.ndarray] = None,
+            scales: Optional[numpy.ndarray] = None,
+            keep: Optional[list[str]] = None) -> Self:
+        """Inserts many poses to the keyframes at once, like calling ``setKeyframe()`` for each of them.
+        - frames is either an array of frame ids for the (keys, 3) positions, (keys, 4) rotations as (w, x, y, z) and (keys, 3) scales,
+          or a list of ``(frame, pose)`` tuples.
+        - Missing properties are filled with the identity.
+        - If there are already keyframes at the frame ids, they will be overwritten. Other keyframes stay as they are.
+        - Negative frame ids are not allowed."""
+        if keep is None: keep = ['position', 'rotation', 'scale']
+        if positions is None and rotations is None and scales is None and not isinstance(frames, numpy.ndarray):
+            frames = list(frames)
+            if len(frames) > 0 and isinstance(frames[0], tuple):
+                incoming = KeyframeTrack.fromPoses(frames)
+                frames, positions, rotations, scales = incoming.Frames, incoming.Positions, incoming.Rotations, incoming.Scales
+
+        incoming = KeyframeTrack(frames, positions, rotations, scales)
+        if len(incoming) > 0 and incoming.Frames[0] < 0:
+            raise ValueError(f'Negative frame id {incoming.Frames[0]} for keyframes of {self.Name}')
+
+        # keep the world space properties in relation to the rest pose
+        if 'position' in keep:
+            space = numpy.array(self.RestPose.SpaceWorldInverse)
+            incoming.Positions = incoming.Positions @ space[:3, :3].T + space[:3, 3]
+        if 'rotation' in keep:
+            incoming.Rotations = Batch.quatMul(numpy.array(self.RestPose.RotationWorldInverse.to_list()), incoming.Rotations)
+        if 'scale' in keep:
+            incoming.Scales = numpy.array(self.RestPose.ScaleWorldInverse.to_list()) * incoming.Scales
+
+        self.Keyframes.merge(incoming.Frames, incoming.Positions, incoming.Rotations, incoming.Scales)
         return self
 
     def removeKeyframe(self, frame: int, recursive: bool = False) -> "Joint":
@@ -164,10 +337,7 @@ class Joint(Transform):
         - If recursive is True -> Child joints do also load their rest pose.
 
         Returns itself."""
-        index = self.__findFrameIndex(frame)
-
-        if index != len(self.Keyframes) and self.Keyframes[index][0] == frame:
-            self.Keyframes.pop(index)[1].clearParent(keep=[])
+        self.Keyframes.remove(frame)
 
         if recursive:
             for child in self.Children:
@@ -181,11 +351,11 @@ class Joint(Transform):
 
         Returns itself."""
         if use is None: use = ['position', 'rotation', 'scale']
-        key = self.getKeyframe(frame)
+        position, rotation, scale = self._sampleKeyframe(frame)
 
-        if 'position' in use: self.Position = key.Position
-        if 'rotation' in use: self.Rotation = key.Rotation
-        if 'scale' in use: self.Scale = key.Scale
+        if 'position' in use: self.Position = position
+        if 'rotation' in use: self.Rotation = rotation
+        if 'scale' in use: self.Scale = scale
 
         if recursive:
             for child in self.Children:
@@ -220,10 +390,14 @@ class Joint(Transform):
         Returns itself."""
         # remove change in rest pose from keyframes
         if keep:
-            for frame, key in self.Keyframes:
-                if 'position' in keep: key.Position = self.SpaceInverse * key.PositionWorld
-                if 'rotation' in keep: key.Rotation = glm.inverse(self.Rotation) * key.RotationWorld
-                if 'scale' in keep: key.Scale = (key.Scale / self.ScaleWorld)
+            keys = self.Keyframes
+            if 'position' in keep:
+                space = numpy.array(self.SpaceInverse * self.RestPose.SpaceWorld, dtype=float)
+                keys.Positions = keys.Positions @ space[:3, :3].T + space[:3, 3]
+            if 'rotation' in keep:
+                keys.Rotations = Batch.quatMul(numpy.array(glm.inverse(self.Rotation) * self.RestPose.RotationWorld, dtype=float), keys.Rotations)
+            if 'scale' in keep:
+                keys.Scales = keys.Scales / numpy.array(self.ScaleWorld, dtype=float)
 
         # write rest pose
         self.RestPose.Position = self.Position
@@ -248,13 +422,13 @@ class Joint(Transform):
         Returns itself."""
         if use is None: use = ['position', 'rotation', 'scale']
         # get animation data
-        key = self.getKeyframe(frame)
+        position, rotation, scale = self._sampleKeyframe(frame)
 
         # set animation pose, world space includes the transform from the rest pose
         self._CurrentFrame = frame
-        if 'position' in use: self.Position = key.PositionWorld
-        if 'rotation' in use: self.Rotation = key.RotationWorld
-        if 'scale' in use: self.Scale = key.ScaleWorld
+        if 'position' in use: self.Position = self.RestPose.SpaceWorld * position
+        if 'rotation' in use: self.Rotation = self.RestPose.RotationWorld * rotation
+        if 'scale' in use: self.Scale = self.RestPose.ScaleWorld * scale
 
         # may do it recursively
         if recursive:
@@ -263,6 +437,34 @@ class Joint(Transform):
 
         return self
 
+    def evaluatePoses(self, frames: Optional[Union[range, list[int], numpy.ndarray]] = None, world: bool = True, dtype: type = numpy.float64) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """Evaluates the animation of this joint and its children at the given frame ids without changing any joint properties.
+        - Returns the positions (frames, joints, 3), rotations (frames, joints, 4) and scales (frames, joints, 3) with the joints in order of ``layout()``.
+        - If world is True -> World space properties are returned, otherwise the local properties that ``loadPose()`` would set.
+        - If frames is None -> All frames of the keyframe range of the hierarchy are evaluated.
+        - The hierarchy is only read, so several threads can evaluate different frames of the same hierarchy at once.
+        - For repeated calls on an unchanged hierarchy, create a ``ForwardKinematics`` once and reuse it.
+        - dtype is the float type of the returned arrays, e.g. ``numpy.float32``."""
+        engine = ForwardKinematics(self, dtype=dtype)
+        if not world:
+            return engine.getLocalPoses(frames)
+        positions, rotations, scales, _ = engine.evaluate(frames)
+        return (positions, rotations, scales)
+
+    def evaluateChain(self, frames: Optional[Union[range, list[int], numpy.ndarray]] = None, dtype: type = numpy.float64) -> tuple[numpy.ndarray, numpy.ndarray]:
+        """Evaluates the world positions (frames, 3) and rotations (frames, 4) of only this joint at the given frame ids.
+        - Only the joints from the root down to this joint are evaluated, other joints of the hierarchy are skipped.
+        - If frames is None -> All frames of the keyframe range of the hierarchy are evaluated.
+        - The hierarchy is only read, joint properties are not changed.
+        - dtype is the float type of the returned arrays, e.g. ``numpy.float32``."""
+        chain = [self]
+        while chain[-1].Parent is not None:
+            chain.append(chain[-1].Parent)
+        chain.reverse()
+
+        positions, rotations, _, _ = ForwardKinematics(chain[0], joints=chain, dtype=dtype).evaluate(frames)
+        return (positions[:, -1], rotations[:, -1])
+
     def writePose(self, frameId: int, recursive: bool = True) -> "Joint":
         """Sets joint properties as animation pose for the given frame id.
         - If there is already a keyframe at the frame id, it will be overwritten.
@@ -287,7 +489,7 @@ class Joint(Transform):
         - If includeChildren is True -> The range considers the earliest and latest frames from its children too.
         The tuple layout is -> [FirstFrameId, LastFrameId]"""
         if len(self.Keyframes) == 0: return (0, 0)
-        range = (self.Keyframes[0][0], self.Keyframes[-1][0])
+        range = self.Keyframes.getRange()
 
         if includeChildren:
             for child in self.Children:
@@ -322,8 +524,7 @@ class Joint(Transform):
         if keep is not None and ('anim' in keep or 'rest' in keep):
             root = self
             while root.Parent is not None:
-                assert self.Parent is not None
-                root = self.Parent
+                root = root.Parent
 
             if 'rest' in keep:
                 root.loadRestPose(recursive=True)
@@ -335,14 +536,7 @@ class Joint(Transform):
                     node.writeRestPose(recursive=False)
 
             if 'anim' in keep:
-                for node in nodes:
-                    for frame in [index for index, _ in node.Keyframes]:
-                        root.loadPose(frame, recursive=True)
-                        node.loadPose(frame, recursive=True)
-                        if 'position' in keep: node.Position = self.SpaceWorldInverse * node.Position
-                        if 'rotation' in keep: node.Rotation = self.RotationWorldInverse * node.Rotation
-                        if 'scale' in keep: node.Scale = self.ScaleWorldInverse * node.Scale
-                        node.writePose(frame, recursive=False)
+                self._rebaseKeyframes(root, nodes, keep, inverse=True)
 
         return self
 
@@ -353,8 +547,7 @@ class Joint(Transform):
         if keep is not None and ('anim' in keep or 'rest' in keep):
             root = self
             while root.Parent is not None:
-                assert self.Parent is not None
-                root = self.Parent
+                root = root.Parent
 
             if 'rest' in keep:
                 root.loadRestPose(recursive=True)
@@ -366,17 +559,52 @@ class Joint(Transform):
                     node.writeRestPose(recursive=False)
 
             if 'anim' in keep:
-                for node in nodes:
-                    for frame in [index for index, _ in node.Keyframes]:
-                        root.loadPose(frame, recursive=True)
-                        node.loadPose(frame, recursive=True)
-                        if 'position' in keep: node.Position = self.SpaceWorld * node.Position
-                        if 'rotation' in keep: node.Rotation = self.RotationWorld * node.Rotation
-                        if 'scale' in keep: node.Scale = self.ScaleWorld * node.Scale
-                        node.writePose(frame, recursive=False)
+                self._rebaseKeyframes(root, nodes, keep, inverse=False)
 
         return self
 
+    def _rebaseKeyframes(self, root: "Joint", nodes: tuple["Joint", ...], keep: list[str], inverse: bool) -> None:
+        """Moves the keyframes of the nodes into or out of the world space of this joint at the same frame, so the animation does not change.
+        - The world spaces of this joint are evaluated for all keyframes of the nodes at once.
+        - If inverse is True -> The keyframes are moved into the space of this joint, used for attaching.
+        - Afterwards the hierarchy and the nodes are in the pose of the last keyframe of the last node."""
+        frames = numpy.unique(numpy.concatenate([numpy.zeros(0, dtype=numpy.int64)] + [node.Keyframes.Frames for node in nodes]))
+        if len(frames) == 0: return
+
+        kinematics = ForwardKinematics(root)
+        index = next(i for i, joint in enumerate(kinematics.Joints) if joint is self)
+        _, rotations, scales, matrices = kinematics.evaluate(frames, matrices=True)
+        matrices, rotations, scales = cast(numpy.ndarray, matrices)[:, index], rotations[:, index], scales[:, index]
+        if inverse:
+            matrices, rotations, scales = numpy.linalg.inv(matrices), Batch.quatInverse(rotations), 1 / scales
+
+        for node in nodes:
+            keys = node.Keyframes
+            if len(keys) == 0: continue
+            rows = frames.searchsorted(keys.Frames)
+
+            # 'Pose = RestPose + Keyframe' in the new parent space, then back into the space of the rest pose
+            if 'position' in keep:
+                rest = numpy.array(node.RestPose.SpaceWorld, dtype=float)
+                restInverse = numpy.array(node.RestPose.SpaceWorldInverse, dtype=float)
+                positions = keys.Positions @ rest[:3, :3].T + rest[:3, 3]
+                positions = numpy.einsum('fab,fb->fa', matrices[rows, :3, :3], positions) + matrices[rows, :3, 3]
+                keys.Positions = positions @ restInverse[:3, :3].T + restInverse[:3, 3]
+            if 'rotation' in keep:
+                rotation = numpy.array(node.RestPose.RotationWorld.to_list(), dtype=float)
+                rotationInverse = numpy.array(node.RestPose.RotationWorldInverse.to_list(), dtype=float)
+                keys.Rotations = Batch.quatMul(rotationInverse, Batch.quatMul(rotations[rows], Batch.quatMul(rotation, keys.Rotations)))
+            if 'scale' in keep:
+                keys.Scales = scales[rows] * keys.Scales
+
+        # same state as loading the poses frame by frame
+        for node in reversed(nodes):
+            if len(node.Keyframes) > 0:
+                frame = int(node.Keyframes.Frames[-1])
+                root.loadPose(frame, recursive=True)
+                node.loadPose(frame, recursive=True)
+                break
+
     def clearParent(self, keep: Optional[list[str]]  = None) -> Self:
         if keep is None: keep = ['position', 'rotation', 'scale', 'rest', 'anim']
         return super().clearParent(keep=keep) 
@@ -398,6 +626,7 @@ class Joint(Transform):
         if position is None: position = glm.vec3()
         change, changeInverse = self.RestPose._applyPositionGetChanges(position)
         self.RestPose.applyPosition(position, recursive=False)
+        self.Keyframes._applyPositionChangeInverse(changeInverse)
 
         for child in self.Children:
             child.RestPose._applyPositionChangeInverse(changeInverse)
@@ -418,6 +647,7 @@ class Joint(Transform):
         if rotation is None: rotation = glm.quat()
         change, changeInverse = self.RestPose._applyRotationGetChanges(rotation)
         self.RestPose.applyRotation(rotation, recursive=False, bake=bakeKeyframes)
+        self.Keyframes._applyRotationChangeInverse(changeInverse, bake=bakeKeyframes)
 
         for child in self.Children:
             child.RestPose._applyRotationChangeInverse(changeInverse, bake=bake)
@@ -438,6 +668,7 @@ class Joint(Transform):
         if scale is None: scale = glm.vec3()
         change, changeInverse = self.RestPose._applyScaleGetChanges(scale)
         self.RestPose.applyScale(scale, recursive=False, bake=bakeKeyframes)
+        self.Keyframes._applyScaleChangeInverse(changeInverse, bake=bakeKeyframes)
 
         for child in self.Children:
             child.RestPose._applyScaleChangeInverse(changeInverse, bake=bake)
@@ -0,0 +1,280 @@
+from collections.abc import Iterable, Sequence
+from typing import Optional, Union, overload
+
+import glm
+import numpy
+from SpatialTransform import Pose, Transform
+
+from .. import Batch
+
+
+class KeyframeTrack(Sequence):
+    """Keyframes of a joint, stored as arrays ordered by frame id.
+
+    Frames holds the unique frame ids. Positions, Rotations and Scales hold the local keyframe properties
+    as (keys, 3), (keys, 4) and (keys, 3) arrays, quaternions are stored as (w, x, y, z).
+
+    As sequence it behaves like a list of ``(frame, key)`` tuples. The key transforms are only created when they are accessed.
+    They read and write the arrays directly and have the rest pose as parent, so their world properties include the rest pose.
+
+    The arrays are views into buffers with spare capacity, so appending keys is amortized O(1) and lookups are binary searches on Frames.
+    Views taken before keys are inserted or removed may not reflect the track anymore."""
+    RestPose: Optional[Transform]
+
+    @property
+    def Frames(self) -> numpy.ndarray:
+        """Frame ids of the keys in ascending order, which is the index for all lookups."""
+        return self._Frames[:self._Count]
+
+    @property
+    def Positions(self) -> numpy.ndarray:
+        return self._Positions[:self._Count]
+
+    @Positions.setter
+    def Positions(self, value: numpy.ndarray) -> None:
+        self._Positions[:self._Count] = value
+
+    @property
+    def Rotations(self) -> numpy.ndarray:
+        return self._Rotations[:self._Count]
+
+    @Rotations.setter
+    def Rotations(self, value: numpy.ndarray) -> None:
+        self._Rotations[:self._Count] = value
+
+    @property
+    def Scales(self) -> numpy.ndarray:
+        return self._Scales[:self._Count]
+
+    @Scales.setter
+    def Scales(self, value: numpy.ndarray) -> None:
+        self._Scales[:self._Count] = value
+
+    def __init__(
+            self,
+            frames: Optional[Union[list[int], numpy.ndarray]] = None,
+            positions: Optional[numpy.ndarray] = None,
+            rotations: Optional[numpy.ndarray] = None,
+            scales: Optional[numpy.ndarray] = None,
+            restPose: Optional[Transform] = None) -> None:
+        """Creates a track from arrays. Missing properties are filled with the identity.
+        - If the frame ids are not ordered -> The keys are sorted by frame id.
+        - If a frame id is given more than once -> The last key with that id is used."""
+        self._Frames = numpy.array([] if frames is None else frames, dtype=numpy.int64).reshape(-1)
+        keys = len(self._Frames)
+        self._Positions = numpy.zeros((keys, 3)) if positions is None else numpy.array(positions, dtype=float).reshape(keys, 3)
+        self._Rotations = numpy.tile([1.0, 0, 0, 0], (keys, 1)) if rotations is None else numpy.array(rotations, dtype=float).reshape(keys, 4)
+        self._Scales = numpy.ones((keys, 3)) if scales is None else numpy.array(scales, dtype=float).reshape(keys, 3)
+        self._Count = keys
+        self.RestPose = restPose
+
+        if keys > 1 and not numpy.all(self._Frames[1:] > self._Frames[:-1]):
+            order = numpy.argsort(self._Frames, kind='stable')
+            last = numpy.append(self._Frames[order][1:] != self._Frames[order][:-1], True)
+            order = order[last]
+            self._Frames, self._Positions, self._Rotations, self._Scales = self._Frames[order], self._Positions[order], self._Rotations[order], self._Scales[order]
+            self._Count = len(order)
+
+    @classmethod
+    def fromPoses(cls, keyframes: Iterable[tuple[int, Pose]], restPose: Optional[Transform] = None) -> "KeyframeTrack":
+        """Creates a track from ``(frame, pose)`` tuples, using the local properties of the poses."""
+        keyframes = list(keyframes)
+        return cls(
+            [frame for frame, _ in keyframes],
+            [key.Position.to_list() for _, key in keyframes],
+            [key.Rotation.to_list() for _, key in keyframes],
+            [key.Scale.to_list() for _, key in keyframes],
+            restPose)
+
+    def __repr__(self) -> str:
+        return f"KeyframeTrack({len(self)} keys, frames {self.getRange()})"
+
+    def __len__(self) -> int:
+        return self._Count
+
+    @overload
+    def __getitem__(self, index: int) -> tuple[int, "Keyframe"]: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[tuple[int, "Keyframe"]]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[tuple[int, "Keyframe"], list[tuple[int, "Keyframe"]]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < -len(self) or index >= len(self):
+            raise IndexError('keyframe index out of range')
+        frame = int(self.Frames[index])
+        key = Keyframe(self, frame)
+        key._Index = index % len(self)
+        return (frame, key)
+
+    def copy(self, restPose: Optional[Transform] = None) -> "KeyframeTrack":
+        """Returns a track with copies of the arrays and the given rest pose."""
+        return KeyframeTrack(self.Frames.copy(), self.Positions.copy(), self.Rotations.copy(), self.Scales.copy(), restPose)
+
+    def search(self, frame: int) -> int:
+        """Index of the first key with a frame id equal or greater than the given one."""
+        return int(self.Frames.searchsorted(frame))
+
+    def find(self, frame: int) -> int:
+        """Index of the key with the given frame id, or -1 if there is none."""
+        index = self.search(frame)
+        return index if index < len(self.Frames) and self.Frames[index] == frame else -1
+
+    def getRange(self) -> tuple[int, int]:
+        """Returns the first and last frame id, or ``(0, 0)`` if there are no keys."""
+        if len(self.Frames) == 0: return (0, 0)
+        return (int(self.Frames[0]), int(self.Frames[-1]))
+
+    def set(self, frame: int, position: glm.vec3, rotation: glm.quat, scale: glm.vec3) -> int:
+        """Sets the properties of the key with the given frame id. Inserts a new key if there is none yet.
+
+        Returns the index of the key."""
+        count = self._Count
+        index = count if count == 0 or frame > self._Frames[count - 1] else self.search(frame)
+        if index == count or self._Frames[index] != frame:
+            if count == len(self._Frames):
+                self._reserve(max(16, 2 * count))
+            if index < count:
+                for buffer in (self._Frames, self._Positions, self._Rotations, self._Scales):
+                    buffer[index + 1:count + 1] = buffer[index:count]
+            self._Frames[index] = frame
+            self._Count += 1
+
+        self._Positions[index] = position.to_list()
+        self._Rotations[index] = rotation.to_list()
+        self._Scales[index] = scale.to_list()
+        return index
+
+    def merge(
+            self,
+            frames: Union[list[int], numpy.ndarray],
+            positions: Optional[numpy.ndarray] = None,
+            rotations: Optional[numpy.ndarray] = None,
+            scales: Optional[numpy.ndarray] = None) -> None:
+        """Inserts many keys at once, the arrays are the same as for the constructor.
+        - If a frame id already exists -> The existing key is overwritten.
+        - Missing properties of the new keys are filled with the identity."""
+        incoming = KeyframeTrack(frames, positions, rotations, scales)
+        if len(incoming) == 0: return
+        if self._Count > 0:
+            # the constructor keeps the last key of duplicated frame ids, which are the incoming ones
+            incoming = KeyframeTrack(
+                numpy.concatenate((self.Frames, incoming.Frames)),
+                numpy.concatenate((self.Positions, incoming.Positions)),
+                numpy.concatenate((self.Rotations, incoming.Rotations)),
+                numpy.concatenate((self.Scales, incoming.Scales)))
+        self._Frames, self._Positions, self._Rotations, self._Scales = incoming._Frames, incoming._Positions, incoming._Rotations, incoming._Scales
+        self._Count = incoming._Count
+
+    def remove(self, frame: int) -> bool:
+        """Removes the key with the given frame id. Returns False if there is none."""
+        index = self.find(frame)
+        if index < 0: return False
+        for buffer in (self._Frames, self._Positions, self._Rotations, self._Scales):
+            buffer[index:self._Count - 1] = buffer[index + 1:self._Count]
+        self._Count -= 1
+        return True
+
+    def sample(self, frames: Union[range, list[int], numpy.ndarray], spherical: bool = False) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """Returns the key properties at the given frame ids like ``Joint.getKeyframe()`` as (frames, 3), (frames, 4) and (frames, 3) arrays.
+        - If there are no keys -> The identity is returned.
+        - Frames between two keys are linearly interpolated, frames out of the key range use the nearest key.
+        - Frame ids may be fractional to sample in between whole frames.
+        - If spherical is True -> Rotations are spherically interpolated instead."""
+        frames = numpy.asarray(frames, dtype=float).reshape(-1)
+        if len(self.Frames) == 0:
+            return (numpy.zeros((len(frames), 3)), numpy.tile([1.0, 0, 0, 0], (len(frames), 1)), numpy.ones((len(frames), 3)))
+        if len(frames) == len(self.Frames) and numpy.array_equal(frames, self.Frames):
+            return (self.Positions.copy(), self.Rotations.copy(), self.Scales.copy())
+
+        after = numpy.clip(numpy.searchsorted(self.Frames, frames, side='left'), 0, len(self.Frames) - 1)
+        before = numpy.clip(after - 1, 0, len(self.Frames) - 1)
+        span = self.Frames[after] - self.Frames[before]
+        weight = numpy.clip((frames - self.Frames[before]) / numpy.where(span > 0, span, 1), 0, 1)[:, None]
+
+        def lerp(values): return values[before] * (1 - weight) + values[after] * weight
+        rotations = Batch.quatSlerp(self.Rotations[before], self.Rotations[after], weight[:, 0]) if spherical else lerp(self.Rotations)
+        return (lerp(self.Positions), rotations, lerp(self.Scales))
+
+    def _reserve(self, capacity: int) -> None:
+        """Moves the keys into new buffers with space for the given key count."""
+        def resize(buffer): return numpy.concatenate((buffer[:self._Count], numpy.zeros((capacity - self._Count,) + buffer.shape[1:], dtype=buffer.dtype)))
+        self._Frames, self._Positions, self._Rotations, self._Scales = resize(self._Frames), resize(self._Positions), resize(self._Rotations), resize(self._Scales)
+
+    def _applyPositionChangeInverse(self, changeInverse: glm.vec3) -> None:
+        """Same change as ``Transform._applyPositionChangeInverse()`` for all keys."""
+        self.Positions += numpy.array(changeInverse, dtype=float)
+
+    def _applyRotationChangeInverse(self, changeInverse: glm.quat, bake: bool = False) -> None:
+        """Same change as ``Transform._applyRotationChangeInverse()`` for all keys."""
+        change = numpy.array(changeInverse, dtype=float)
+        self.Positions = Batch.quatRotate(change, self.Positions)
+        if not bake:
+            self.Rotations = Batch.quatMul(change, self.Rotations)
+
+    def _applyScaleChangeInverse(self, changeInverse: glm.vec3, bake: bool = False) -> None:
+        """Same change as ``Transform._applyScaleChangeInverse()`` for all keys."""
+        change = numpy.array(changeInverse, dtype=float)
+        self.Positions = change * self.Positions
+        if not bake:
+            self.Scales = change * self.Scales
+
+
+class Keyframe(Transform):
+    """Key of a keyframe track as transform, which reads and writes the arrays of the track.
+    - The key is identified by its frame id, it becomes invalid if the key is removed from the track.
+    - The parent is the rest pose of the track, but the key is not one of its children and can not be attached to other transforms."""
+
+    @property
+    def Frame(self) -> int:
+        """Frame id of the key."""
+        return self._Frame
+
+    @property
+    def _Parent(self) -> Optional[Transform]:
+        return self._Track.RestPose
+
+    @property
+    def Space(self) -> glm.mat4:
+        """Transform space with properties."""
+        return glm.scale(glm.translate(self.Position), self.Scale) * glm.mat4_cast(self.Rotation)
+
+    @property
+    def _Position(self) -> glm.vec3:
+        return glm.vec3(*self._Track.Positions[self._index()].tolist())
+
+    @_Position.setter
+    def _Position(self, value: glm.vec3) -> None:
+        self._Track.Positions[self._index()] = glm.vec3(value).to_list()
+
+    @property
+    def _Rotation(self) -> glm.quat:
+        return glm.quat(*self._Track.Rotations[self._index()].tolist())
+
+    @_Rotation.setter
+    def _Rotation(self, value: glm.quat) -> None:
+        self._Track.Rotations[self._index()] = glm.quat(value).to_list()
+
+    @property
+    def _Scale(self) -> glm.vec3:
+        return glm.vec3(*self._Track.Scales[self._index()].tolist())
+
+    @_Scale.setter
+    def _Scale(self, value: glm.vec3) -> None:
+        self._Track.Scales[self._index()] = glm.vec3(value).to_list()
+
+    def __init__(self, track: KeyframeTrack, frame: int) -> None:
+        self._Track = track
+        self._Frame = frame
+        self._Index = -1
+        self._Name = f'Key {frame}'
+        self._Children = []
+
+    def _index(self) -> int:
+        # the index is only searched again if keys have been inserted or removed
+        frames = self._Track.Frames
+        if self._Index < 0 or self._Index >= len(frames) or frames[self._Index] != self._Frame:
+            self._Index = self._Track.find(self._Frame)
+            if self._Index < 0: raise KeyError(f'Keyframe {self._Frame} does not exist anymore')
+        return self._Index
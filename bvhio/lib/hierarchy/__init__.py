@@ -1 +1,3 @@
-from .Joint import Joint
+from .Joint import Joint, WorldCacheCounters
+from .KeyframeTrack import KeyframeTrack, Keyframe
+from .ForwardKinematics import ForwardKinematics
@@ -0,0 +1,140 @@
+"""Throughput benchmarks for the reader and writer. Not part of the unit tests.
+
+Run from the repository root with: ``python bvhio/tests/benchmarks.py``"""
+import bisect
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+import bvhio  # noqa: E402
+from bvhio.lib import Parser  # noqa: E402
+
+
+def createContainer(frames: int) -> bvhio.BvhContainer:
+    """Example skeleton with random columnar motion data for the given frame count."""
+    bvh = bvhio.readAsBvh(os.path.join(os.path.dirname(__file__), 'example.bvh'), columnar=True)
+    bvh.Motion = numpy.random.default_rng(0).uniform(-180, 180, (frames, bvh.Motion.shape[1]))
+    Parser._deserializeMotion(bvh.Root, bvh.Motion, columnar=True)
+    bvh.FrameCount = frames
+    return bvh
+
+
+def writePerValue(path: str, bvh: bvhio.BvhContainer, percision: int) -> None:
+    """Reference of the previous writer, which wrote every channel value on its own."""
+    with open(path, "w") as file:
+        for row in Parser._serializeMotion(bvh.Root, bvh.FrameCount).tolist():
+            for value in row:
+                file.write(f'{round(value, percision)} ')
+            file.write('\n')
+
+
+def measure(method, *args) -> float:
+    start = time.perf_counter()
+    method(*args)
+    return time.perf_counter() - start
+
+
+def benchmarkWriteBvh(frameCounts: list[int] = [10_000, 100_000], percision: int = 9) -> None:
+    print('writeBvh throughput (frames per second, megabytes per second)')
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'benchmark.bvh')
+        for frames in frameCounts:
+            bvh = createContainer(frames)
+            for name, method, args in [
+                    ('per value', writePerValue, (path, bvh, percision)),
+                    ('buffered', bvhio.writeBvh, (path, bvh, percision)),
+                    ('buffered fast', bvhio.writeBvh, (path, bvh, percision, True))]:
+                seconds = measure(method, *args)
+                megabytes = os.path.getsize(path) / 1e6
+                print(f'{frames:>9} frames  {name:<14} {frames / seconds:>12.0f} f/s {megabytes / seconds:>8.1f} MB/s')
+
+
+def loopWorldPositions(root: bvhio.Joint, frames: int) -> None:
+    """Reference of reading the world positions joint by joint after loading each pose."""
+    joints = [joint for joint, _, _ in root.layout()]
+    for frame in range(frames):
+        root.loadPose(frame, recursive=True)
+        [joint.PositionWorld for joint in joints]
+
+
+def benchmarkForwardKinematics(frames: int = 2_000) -> None:
+    print('world positions of all joints (frames per second)')
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'benchmark.bvh')
+        bvhio.writeBvh(path, createContainer(frames))
+        root = bvhio.readAsHierarchy(path)
+        for name, method, args in [
+                ('loadPose', loopWorldPositions, (root, frames)),
+                ('ForwardKinematics', lambda: bvhio.ForwardKinematics(root).evaluate(), ())]:
+            seconds = measure(method, *args)
+            print(f'{frames:>9} frames  {name:<18} {frames / seconds:>12.0f} f/s')
+
+
+def setKeyframesListBased(frames: list[int]) -> None:
+    """Reference of the previous keyframe list, which rebuilt the list of frame ids for lookups and attached every key to the rest pose."""
+    restPose = bvhio.Transform('RestPose')
+    keyframes = []
+    for frame in frames:
+        index = len(keyframes) if not keyframes or frame > keyframes[-1][0] else bisect.bisect_left([key[0] for key in keyframes], frame)
+        key = bvhio.Transform(f'Key {frame}')
+        keyframes.insert(index, (frame, key))
+        restPose.attach(key, keep=None)
+
+
+def setKeyframes(frames: list[int]) -> None:
+    joint = bvhio.Joint('Joint')
+    pose = bvhio.Transform(position=(1, 2, 3))
+    for frame in frames:
+        joint.setKeyframe(frame, pose, keep=None)
+
+
+def setKeyframesBulk(frames: list[int]) -> None:
+    joint = bvhio.Joint('Joint')
+    joint.setKeyframes(frames, numpy.tile([1.0, 2, 3], (len(frames), 1)), keep=None)
+
+
+def benchmarkSetKeyframe(frameCounts: list[int] = [10_000, 100_000], referenceLimit: int = 20_000) -> None:
+    print('setKeyframe into one joint (keyframes per second)')
+    for frames in frameCounts:
+        for order, ids in [('ascending', list(range(frames))), ('descending', list(range(frames))[::-1])]:
+            for name, method in [('list based', setKeyframesListBased), ('track', setKeyframes), ('bulk', setKeyframesBulk)]:
+                if method is setKeyframesListBased and frames > referenceLimit:
+                    print(f'{frames:>9} keys  {name:<11} {order:<11} {"skipped":>12}')
+                    continue
+                seconds = measure(method, ids)
+                print(f'{frames:>9} keys  {name:<11} {order:<11} {frames / seconds:>12.0f} k/s')
+
+
+def allocated(method, *args, **kwargs) -> int:
+    """Bytes that are still allocated by the result of the method."""
+    tracemalloc.start()
+    result = method(*args, **kwargs)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def benchmarkMemory(frames: int = 10_000, joints: int = 10_000) -> None:
+    print('joint memory (bytes per joint)')
+    for joint in [bvhio.BvhJoint, bvhio.CompactBvhJoint]:
+        print(f'{joints:>9} joints  {joint.__name__:<16} {allocated(lambda: [joint(f"Joint{i}") for i in range(joints)]) / joints:>8.1f} B')
+
+    print('readAsBvh memory (bytes per joint and frame)')
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'benchmark.bvh')
+        bvhio.writeBvh(path, createContainer(frames))
+        values = frames * len(bvhio.readAsBvh(path, loadKeyFrames=False).Root.layout())
+        for name, options in [('poses', {}), ('compact', {'compact': True}), ('columnar', {'columnar': True})]:
+            print(f'{frames:>9} frames  {name:<9} {allocated(bvhio.readAsBvh, path, **options) / values:>8.1f} B')
+
+
+if __name__ == '__main__':
+    benchmarkWriteBvh()
+    benchmarkForwardKinematics()
+    benchmarkSetKeyframe()
+    benchmarkMemory()
@@ -0,0 +1,38 @@
+import unittest
+import itertools
+import numpy
+import glm
+from bvhio.lib import Batch
+from SpatialTransform import Euler, Pose
+from utils import *
+
+class Conversions(unittest.TestCase):
+    def setUp(self):
+        self.eulers = numpy.random.default_rng(0).uniform(-360, 360, (500, 3))
+        self.orders = [''.join(order) for length in (1, 2, 3) for order in itertools.permutations('XYZ', length)]
+
+    def test_eulerToQuat(self):
+        for order, extrinsic in itertools.product(self.orders, (False, True)):
+            result = Batch.eulerToQuat(self.eulers, order, extrinsic)
+            for euler, quat in zip(self.eulers, result):
+                expected = Euler.toQuatFrom(glm.radians(glm.vec3(*euler)), order, extrinsic)
+                self.assertGreater(deltaRotation, deviationQuaternion(glm.quat(*quat), expected))
+
+    def test_quatToEuler(self):
+        quats = Batch.eulerToQuat(self.eulers, 'ZXY', False)
+        for order, extrinsic in itertools.product(Euler.getOrders(), (False, True)):
+            result = Batch.quatToEuler(quats, order, extrinsic)
+            for quat, euler in zip(quats, result):
+                expected = Pose(rotation=glm.quat(*quat)).getEuler(order, extrinsic)
+                self.assertGreater(1e-02, deviationPosition(glm.vec3(*euler), expected))
+                roundtrip = Euler.toQuatFrom(glm.radians(glm.vec3(*euler)), order, extrinsic)
+                self.assertGreater(deltaRotation, min(deviationQuaternion(glm.quat(*quat), roundtrip), deviationQuaternion(glm.quat(*quat), -roundtrip)))
+
+    def test_quatSlerp(self):
+        a = Batch.eulerToQuat(self.eulers, 'ZXY', False)
+        b = numpy.concatenate((Batch.eulerToQuat(self.eulers[::-1], 'ZXY', False)[:-2], a[-2:]))
+        weights = numpy.random.default_rng(1).uniform(0, 1, len(a))
+        result = Batch.quatSlerp(a, b, weights)
+        for qa, qb, weight, quat in zip(a, b, weights, result):
+            expected = glm.slerp(glm.quat(*qa), glm.quat(*qb), float(weight))
+            self.assertGreater(deltaRotation, deviationQuaternion(glm.quat(*quat), expected))
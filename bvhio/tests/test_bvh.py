@@ -1,3 +1,6 @@
+import os
+import tempfile
+import tracemalloc
 import unittest
 import bvhio
 import glm
@@ -13,6 +16,22 @@ class Container(unittest.TestCase):
     def test_FrameCount(self):
         self.assertEqual(self.instance.FrameCount, 2)
 
+    def test_resample(self):
+        for columnar in (False, True):
+            instance = bvhio.readAsBvh('bvhio/tests/example.bvh', columnar=columnar)
+            keys = [(key.Position, key.Rotation) for key in instance.Root.Keyframes]
+            instance.resample(0.033333 / 4)
+            self.assertEqual(instance.FrameCount, 5)
+            self.assertEqual(instance.FrameTime, 0.033333 / 4)
+            self.assertEqual(instance.Motion is not None, columnar)
+            for joint, _, _ in instance.Root.layout():
+                self.assertEqual(len(joint.Keyframes), 5)
+
+            resampled = instance.Root.Keyframes
+            for frame, weight in [(0, 0), (1, 0.25), (2, 0.5), (4, 1)]:
+                self.assertGreater(1e-04, deviationPosition(resampled[frame].Position, glm.lerp(keys[0][0], keys[1][0], weight)))
+                self.assertGreater(1e-04, deviationQuaternion(resampled[frame].Rotation, glm.slerp(keys[0][1], keys[1][1], weight)))
+
 class BvhJoint(unittest.TestCase):
     def setUp(self):
         self.instance = bvhio.readAsBvh('bvhio/tests/example.bvh').Root
@@ -102,3 +121,80 @@ class BvhJoint(unittest.TestCase):
                 self.assertEqual(pose.Position, self.frames[i][frame][0])
                 self.assertEqual(pose.Scale, glm.vec3(1))
                 self.assertGreater(1e-05, glm.length(pose.Rotation - self.frames[i][frame][1]))
+
+class Columnar(unittest.TestCase):
+    def setUp(self):
+        self.reference = bvhio.readAsBvh('bvhio/tests/example.bvh')
+        self.instance = bvhio.readAsBvh('bvhio/tests/example.bvh', columnar=True)
+
+    def test_Motion(self):
+        channels = sum(len(j.Channels) for j, i, d in self.instance.Root.layout())
+        self.assertEqual(self.instance.Motion.shape, (self.instance.FrameCount, channels))
+        self.assertIsNone(self.reference.Motion)
+
+    def test_Keyframes(self):
+        for j, i, d in self.instance.Root.layout():
+            reference = self.reference.Root.layout()[i][0].Keyframes
+            self.assertEqual(len(j.Keyframes), len(reference))
+            for frame, pose in enumerate(j.Keyframes):
+                self.assertEqual(pose.Position, reference[frame].Position)
+                self.assertEqual(pose.Rotation, reference[frame].Rotation)
+            self.assertEqual(j.Keyframes[-1].Rotation, reference[-1].Rotation)
+
+    def test_Modify(self):
+        keyframes = self.instance.Root.Keyframes
+        keyframes.extend(self.reference.Root.Keyframes)
+        self.assertFalse(keyframes.isColumnar())
+        self.assertEqual(len(keyframes), 2 * self.instance.FrameCount)
+        self.assertEqual(keyframes[-1].Position, self.reference.Root.Keyframes[-1].Position)
+
+class Compact(unittest.TestCase):
+    def measure(self, create) -> int:
+        """Bytes that are still allocated by the created objects."""
+        tracemalloc.start()
+        result = create()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del result
+        return size
+
+    def test_Keyframes(self):
+        reference = bvhio.readAsBvh('bvhio/tests/example.bvh')
+        instance = bvhio.readAsBvh('bvhio/tests/example.bvh', compact=True)
+        for (j, i, d), (expected, _, _) in zip(instance.Root.layout(), reference.Root.layout()):
+            self.assertIsInstance(j, bvhio.CompactBvhJoint)
+            self.assertFalse(hasattr(j, '__dict__'))
+            self.assertEqual((j.Name, j.Offset, j.EndSite, j.Channels), (expected.Name, expected.Offset, expected.EndSite, expected.Channels))
+            self.assertEqual(j.getRotation(), expected.getRotation())
+            self.assertEqual(len(j.Keyframes), len(expected.Keyframes))
+            for pose, expectedPose in zip(j.Keyframes, expected.Keyframes):
+                self.assertIsInstance(pose, bvhio.CompactPose)
+                self.assertEqual(pose.Position, expectedPose.Position)
+                self.assertEqual(pose.Rotation, expectedPose.Rotation)
+                self.assertEqual(pose.Scale, glm.vec3(1))
+                self.assertEqual(pose.toPose().Rotation, expectedPose.Rotation)
+        root = bvhio.convertBvhToHierarchy(instance.Root)
+        self.assertEqual(len(root.layout()), len(reference.Root.layout()))
+
+    def test_Memory(self):
+        # bytes per joint
+        count = 2000
+        before = self.measure(lambda: [bvhio.BvhJoint(f'Joint{i}') for i in range(count)]) / count
+        after = self.measure(lambda: [bvhio.CompactBvhJoint(f'Joint{i}') for i in range(count)]) / count
+        self.assertLess(after, before, f'{after:.0f} bytes per joint, {before:.0f} before')
+
+        # bytes per frame and joint
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'example.bvh')
+            bvhio.writeBvh(path, bvhio.readAsBvh('bvhio/tests/example.bvh').resample(0.033333 / 100))
+            header = bvhio.readAsBvh(path, loadKeyFrames=False)
+            values = header.FrameCount * len(header.Root.layout())
+            before = self.measure(lambda: bvhio.readAsBvh(path)) / values
+            after = self.measure(lambda: bvhio.readAsBvh(path, compact=True)) / values
+        self.assertLess(after, before * 0.6, f'{after:.0f} bytes per frame and joint, {before:.0f} before')
+
+        # default joints keep their per-instance attributes, compact joints do not have any
+        joint = bvhio.BvhJoint('Joint')
+        joint.Custom = 1
+        self.assertEqual(joint.Custom, 1)
+        self.assertRaises(AttributeError, setattr, bvhio.CompactBvhJoint('Joint'), 'Custom', 1)
@@ -1,6 +1,8 @@
 import unittest
 import bvhio
 import glm
+import numpy
+from concurrent.futures import ThreadPoolExecutor
 from utils import *
 
 Joints = [ # for j, i, d in root.layout(): print(f"( {d}, {len(j.Children)}, {len(j.Keyframes)}, {j.KeyframeRange}, '{j.Name}', ),")
@@ -242,3 +244,226 @@ class Methods(unittest.TestCase):
             self.assertGreater(1e-03, deviationPosition(j.PositionWorld, Pose0World[i][0]))
             self.assertGreater(1e-05, deviationQuaternion(j.RotationWorld, Pose0World[i][1]))
             self.assertGreater(1e-06,  glm.length(j.ScaleWorld - Pose0World[i][2]))
+
+    def test_attach(self):
+        instance = bvhio.readAsHierarchy('bvhio/tests/example.bvh')
+        leftCollar = instance.filter('LeftCollar')[0]
+        neck = instance.filter('Neck')[0]
+
+        def worldPoses():
+            return [[(j.PositionWorld, j.RotationWorld) for j, _, _ in instance.loadPose(frame).layout() if j.Name.startswith('Left')] for frame in [0, 1]]
+
+        expected = worldPoses()
+        neck.attach(leftCollar)
+        self.assertIs(leftCollar.Parent, neck)
+        for frame, poses in zip([0, 1], worldPoses()):
+            for (position, rotation), (expectedPosition, expectedRotation) in zip(poses, expected[frame]):
+                self.assertGreater(1e-03, deviationPosition(position, expectedPosition))
+                self.assertGreater(1e-05, deviationQuaternion(rotation, expectedRotation))
+
+
+    def test_worldCache(self):
+        instance = bvhio.readAsHierarchy('bvhio/tests/example.bvh')
+        chest = instance.filter('Chest')[0]
+        neck = instance.filter('Neck')[0]
+        head = instance.filter('Head')[0]
+
+        def chainSpace(joint):
+            return (chainSpace(joint.Parent) if joint.Parent is not None else glm.mat4()) * joint.Space
+
+        def chainRotation(joint):
+            return (chainRotation(joint.Parent) if joint.Parent is not None else glm.quat()) * joint.Rotation
+
+        def assertWorld():
+            self.assertGreater(1e-03, numpy.abs(numpy.array(head.SpaceWorld) - numpy.array(chainSpace(head))).max())
+            self.assertGreater(1e-05, deviationQuaternion(head.RotationWorld, chainRotation(head)))
+
+        bvhio.Joint.WorldCache.reset()
+        instance.loadPose(0)
+        assertWorld()
+        misses = bvhio.Joint.WorldCache.Misses
+        head.PositionWorld
+        head.SpaceWorld
+        self.assertEqual(bvhio.Joint.WorldCache.Misses, misses)
+        self.assertGreater(bvhio.Joint.WorldCache.HitRate, 0)
+
+        chest.Rotation = chest.Rotation * glm.angleAxis(0.5, glm.vec3(1, 0, 0))
+        assertWorld()
+        instance.loadPose(1)
+        assertWorld()
+        chest.PositionWorld = glm.vec3(1, 2, 3)
+        assertWorld()
+        chest.detach(neck, keep=[])
+        assertWorld()
+
+
+class Keyframes(unittest.TestCase):
+    def test_Track(self):
+        instance = bvhio.readAsHierarchy('bvhio/tests/example.bvh')
+        self.assertIsInstance(instance.Keyframes, bvhio.KeyframeTrack)
+        self.assertEqual(len(instance.RestPose.Children), 0)
+        self.assertEqual([frame for frame, _ in instance.Keyframes], [0, 1])
+
+        instance.setKeyframe(5, bvhio.Transform(position=(1, 2, 3)), keep=None)
+        instance.setKeyframe(3, bvhio.Transform(position=(4, 5, 6)), keep=None)
+        self.assertEqual(instance.Keyframes.Frames.tolist(), [0, 1, 3, 5])
+        self.assertEqual(instance.getKeyframeRange(includeChildren=False), (0, 5))
+        self.assertEqual(instance.getKeyframe(3).Position, glm.vec3(4, 5, 6))
+
+        instance.removeKeyframe(3)
+        self.assertEqual(instance.Keyframes.Frames.tolist(), [0, 1, 5])
+        self.assertGreater(1e-05, glm.length(instance.getKeyframe(3).Position - glm.vec3(1, 2, 3) * 0.5 - instance.getKeyframe(1).Position * 0.5))
+
+        instance.Keyframes = [(2, bvhio.Transform(position=(1, 0, 0))), (1, bvhio.Transform(position=(2, 0, 0))), (1, bvhio.Transform(position=(3, 0, 0)))]
+        self.assertEqual(instance.Keyframes.Frames.tolist(), [1, 2])
+        self.assertEqual(instance.Keyframes[0][1].Position, glm.vec3(3, 0, 0))
+
+    def test_Keyframe(self):
+        instance = bvhio.readAsHierarchy('bvhio/tests/example.bvh')
+        frame, key = instance.Keyframes[1]
+        key.Position = glm.vec3(1, 2, 3)
+        self.assertEqual(instance.Keyframes.Positions[1].tolist(), [1, 2, 3])
+        self.assertIs(key.Parent, instance.RestPose)
+        self.assertGreater(1e-05, glm.length(key.PositionWorld - instance.RestPose.SpaceWorld * glm.vec3(1, 2, 3)))
+
+        key.PositionWorld = glm.vec3(4, 5, 6)
+        self.assertGreater(1e-05, glm.length(instance.loadPose(1, recursive=False).Position - glm.vec3(4, 5, 6)))
+
+        instance.setKeyframe(-1, bvhio.Transform(), keep=None)
+        instance.removeKeyframe(1)
+        self.assertRaises(KeyError, lambda: key.Position)
+
+    def test_setKeyframes(self):
+        instance = bvhio.readAsHierarchy('bvhio/tests/example.bvh').filter('Neck')[0]
+        reference = bvhio.readAsHierarchy('bvhio/tests/example.bvh').filter('Neck')[0]
+        rng = numpy.random.default_rng(0)
+        frames = [7, 1, 4, 9]
+        positions = rng.uniform(-1, 1, (4, 3))
+        rotations = rng.uniform(-1, 1, (4, 4))
+        rotations /= numpy.linalg.norm(rotations, axis=1, keepdims=True)
+        scales = rng.uniform(0.5, 2, (4, 3))
+
+        instance.setKeyframes(frames, positions, rotations, scales)
+        for frame, position, rotation, scale in zip(frames, positions.tolist(), rotations.tolist(), scales.tolist()):
+            reference.setKeyframe(frame, bvhio.Transform(position=position, rotation=glm.quat(*rotation), scale=scale))
+        self.assertEqual(instance.Keyframes.Frames.tolist(), reference.Keyframes.Frames.tolist())
+        self.assertTrue(numpy.allclose(instance.Keyframes.Positions, reference.Keyframes.Positions, atol=1e-05))
+        self.assertTrue(numpy.allclose(instance.Keyframes.Rotations, reference.Keyframes.Rotations, atol=1e-05))
+        self.assertTrue(numpy.allclose(instance.Keyframes.Scales, reference.Keyframes.Scales, atol=1e-05))
+
+        instance.setKeyframes([(4, bvhio.Transform(position=(1, 2, 3))), (12, bvhio.Transform())], keep=[])
+        self.assertEqual(instance.Keyframes.Frames.tolist(), [0, 1, 4, 7, 9, 12])
+        self.assertEqual(instance.getKeyframe(4).Position, glm.vec3(1, 2, 3))
+        self.assertRaises(ValueError, instance.setKeyframes, [-1, 2])
+
+
+class Kinematics(unittest.TestCase):
+    def assertMatchesLoadPose(self, instance: bvhio.Joint, frames: list[int]):
+        positions, rotations, scales, matrices = bvhio.ForwardKinematics(instance).evaluate(frames, matrices=True)
+        for f, frame in enumerate(frames):
+            instance.loadPose(frame, recursive=True)
+            for j, i, d in instance.layout():
+                self.assertGreater(1e-04, deviationPosition(glm.vec3(*positions[f, i]), j.PositionWorld))
+                self.assertGreater(1e-04, deviationQuaternion(glm.quat(*rotations[f, i]), j.RotationWorld))
+                self.assertGreater(1e-04, deviationScale(glm.vec3(*scales[f, i]), j.ScaleWorld))
+                self.assertGreater(1e-04, glm.length(glm.vec3(*matrices[f, i, :3, 3]) - j.SpaceWorld[3].xyz))
+
+    def test_evaluate(self):
+        instance = bvhio.readAsHierarchy('bvhio/tests/example.bvh')
+        self.assertMatchesLoadPose(instance, [0, 1])
+
+    def test_evaluateInterpolated(self):
+        instance = bvhio.readAsHierarchy('bvhio/tests/example.bvh')
+        for joint, i, d in instance.layout():
+            keys = [key for _, key in joint.Keyframes]
+            joint.Keyframes = [(2, keys[0]), (6, keys[1])]
+        instance.filter('Chest')[0].RestPose.Scale = glm.vec3(1, 2, 0.5)
+        self.assertMatchesLoadPose(instance, list(range(9)))
+
+    def test_evaluateChain(self):
+        instance = bvhio.readAsHierarchy('bvhio/tests/example.bvh')
+        joint = instance.filter('LeftHand')[0]
+        positions, rotations = joint.evaluateChain([1, 0])
+        self.assertEqual((2, 3), positions.shape)
+        self.assertEqual((2, 4), rotations.shape)
+        for f, frame in enumerate([1, 0]):
+            instance.loadPose(frame, recursive=True)
+            self.assertGreater(1e-04, deviationPosition(glm.vec3(*positions[f]), joint.PositionWorld))
+            self.assertGreater(1e-04, deviationQuaternion(glm.quat(*rotations[f]), joint.RotationWorld))
+
+        engine = bvhio.ForwardKinematics(instance, joints=[instance, instance.filter('Chest')[0]])
+        self.assertEqual(['Hips', 'Chest'], engine.Names)
+        self.assertRaises(ValueError, bvhio.ForwardKinematics, instance, [joint])
+
+    def test_sampleKeyframes(self):
+        instance = bvhio.readAsHierarchy('bvhio/tests/example.bvh')
+        joint = instance.filter('Chest')[0]
+        keys = [key for _, key in joint.Keyframes]
+        joint.Keyframes = [(2, keys[0]), (6, keys[1])]
+
+        positions, rotations, scales = joint.sampleKeyframes([0, 2, 3.5, 5, 6, 9])
+        self.assertEqual((6, 3), positions.shape)
+        self.assertEqual((6, 4), rotations.shape)
+        for i, (frame, weight) in enumerate([(0, 0), (2, 0), (3.5, 0.375), (5, 0.75), (6, 1), (9, 1)]):
+            self.assertGreater(1e-04, deviationPosition(glm.vec3(*positions[i]), glm.lerp(keys[0].Position, keys[1].Position, weight)))
+            self.assertGreater(1e-04, deviationQuaternion(glm.quat(*rotations[i]), glm.slerp(keys[0].Rotation, keys[1].Rotation, weight)))
+            self.assertGreater(1e-04, deviationScale(glm.vec3(*scales[i]), glm.vec3(1)))
+
+        positions, rotations, scales = joint.sampleKeyframes([4], spherical=False)
+        self.assertGreater(1e-04, deviationQuaternion(glm.quat(*rotations[0]), joint.getKeyframe(4).Rotation))
+
+    def test_resample(self):
+        instance = bvhio.readAsHierarchy('bvhio/tests/example.bvh')
+        instance.filter('Head')[0].Keyframes = []
+        expected = {joint.Name: joint.sampleKeyframes([0, 0.5, 1]) for joint, _, _ in instance.layout()}
+
+        instance.resample(1/30, 1/60)
+        self.assertEqual(instance.getKeyframeRange(), (0, 2))
+        self.assertEqual(len(instance.filter('Head')[0].Keyframes), 0)
+        for joint, _, _ in instance.layout():
+            if joint.Name == 'Head': continue
+            self.assertEqual(joint.Keyframes.Frames.tolist(), [0, 1, 2])
+            for array, reference in zip((joint.Keyframes.Positions, joint.Keyframes.Rotations, joint.Keyframes.Scales), expected[joint.Name]):
+                self.assertTrue(numpy.allclose(array, reference))
+
+        instance.resample(1/60, 1/30, recursive=False)
+        self.assertEqual(instance.Keyframes.Frames.tolist(), [0, 1])
+        self.assertEqual(instance.filter('Chest')[0].Keyframes.Frames.tolist(), [0, 1, 2])
+
+    def test_evaluateDtype(self):
+        instance = bvhio.readAsHierarchy('bvhio/tests/example.bvh')
+        expected = bvhio.ForwardKinematics(instance).evaluate(matrices=True)
+        result = bvhio.ForwardKinematics(instance, dtype=numpy.float32).evaluate(matrices=True)
+        for array, reference in zip(result, expected):
+            self.assertEqual(array.dtype, numpy.float32)
+            self.assertTrue(numpy.allclose(array, reference, atol=1e-03))
+        self.assertEqual(instance.evaluatePoses(dtype=numpy.float32)[0].dtype, numpy.float32)
+        self.assertEqual(instance.filter('LeftHand')[0].evaluateChain(dtype=numpy.float32)[1].dtype, numpy.float32)
+
+    def test_getKeyframeInterpolated(self):
+        instance = bvhio.readAsHierarchy('bvhio/tests/example.bvh')
+        keys = [key for _, key in instance.Keyframes]
+        instance.Keyframes = [(2, keys[0]), (6, keys[1])]
+        self.assertEqual(instance.getKeyframe(0).Position, keys[0].Position)
+        self.assertGreater(1e-04, glm.length(instance.getKeyframe(3).Position - glm.lerp(keys[0].Position, keys[1].Position, 0.25)))
+        self.assertEqual(instance.getKeyframe(8).Position, keys[1].Position)
+
+    def test_evaluatePoses(self):
+        instance = bvhio.readAsHierarchy('bvhio/tests/example.bvh')
+        instance.loadRestPose(recursive=True)
+        properties = [(j.Position, j.Rotation, j.Scale) for j, i, d in instance.layout()]
+
+        positions, rotations, scales = instance.evaluatePoses([1, 0], world=False)
+        self.assertEqual(properties, [(j.Position, j.Rotation, j.Scale) for j, i, d in instance.layout()])
+        for j, i, d in instance.loadPose(1, recursive=True).layout():
+            self.assertGreater(1e-04, deviationPosition(glm.vec3(*positions[0, i]), j.Position))
+            self.assertGreater(1e-04, deviationQuaternion(glm.quat(*rotations[0, i]), j.Rotation))
+            self.assertGreater(1e-04, deviationScale(glm.vec3(*scales[0, i]), j.Scale))
+
+        frames = [[0], [1], [0, 1], [1, 0]]
+        expected = [instance.evaluatePoses(f) for f in frames]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(instance.evaluatePoses, frames * 8))
+        for i, result in enumerate(results):
+            for array, reference in zip(result, expected[i % len(frames)]):
+                self.assertTrue(numpy.array_equal(array, reference))
@@ -1,5 +1,13 @@
+import os
+import tempfile
 import unittest
+import unittest.mock
+import warnings
+import glm
+import numpy
 import bvhio
+from bvhio.lib import Parser as ParserModule
+from bvhio.lib import Stream as StreamModule
 
 class Parser(unittest.TestCase):
     def test_readAsBVH(self):
@@ -12,3 +20,319 @@ class Parser(unittest.TestCase):
     def test_readAsHierarchy(self):
         data = bvhio.readAsHierarchy('bvhio/tests/example.bvh')
         self.assertEqual(bvhio.Joint, type(data))
+
+    def test_convertBvhToHierarchy(self):
+        def convertPerFrame(bvh: bvhio.BvhJoint) -> bvhio.Joint:
+            joint = bvhio.Joint(bvh.Name, restPose=bvhio.Transform(position=bvh.Offset, rotation=bvh.getRotation()))
+            for frame, key in enumerate(bvh.Keyframes):
+                joint.setKeyframe(frame, bvhio.Transform(position=key.Position, rotation=key.Rotation))
+            for frame, key in joint.Keyframes:
+                key.Position = joint.RestPose.SpaceInverse * key.Position
+                key.Rotation = glm.inverse(joint.RestPose.Rotation) * (key.Rotation * joint.RestPose.Rotation)
+            for child in bvh.Children:
+                childJoint = convertPerFrame(child)
+                childJoint.RestPose.Position = glm.inverse(joint.RestPose.Rotation) * childJoint.RestPose.Position
+                childJoint.RestPose.Rotation = glm.inverse(joint.RestPose.Rotation) * childJoint.RestPose.Rotation
+                joint.attach(childJoint)
+            return joint
+
+        bvh = bvhio.readAsBvh('bvhio/tests/example.bvh')
+        for (joint, _, _), (expected, _, _) in zip(bvhio.convertBvhToHierarchy(bvh.Root).layout(), convertPerFrame(bvh.Root).layout()):
+            self.assertGreater(1e-05, glm.length(joint.RestPose.Position - expected.RestPose.Position))
+            self.assertGreater(1e-05, glm.length(joint.RestPose.Rotation - expected.RestPose.Rotation))
+            self.assertTrue(numpy.allclose(joint.Keyframes.Positions, expected.Keyframes.Positions, atol=1e-04))
+            self.assertTrue(numpy.allclose(joint.Keyframes.Rotations, expected.Keyframes.Rotations, atol=1e-05))
+
+    def test_convertHierarchyToBvh(self):
+        def convertPerFrame(joint: bvhio.Joint, frames: int, worldSpace: bvhio.Pose) -> bvhio.BvhJoint:
+            bvh = bvhio.BvhJoint(joint.Name, worldSpace.Space * joint.RestPose.Position)
+            keys = [joint.getKeyframe(frame).toPose(worldSpace=False) for frame in range(frames)]
+            worldSpace.Rotation = worldSpace.Rotation * joint.RestPose.Rotation
+            if 1e-02 < glm.l1Norm(sum([glm.abs(key.Position) for key in keys])):
+                bvh.Channels.extend(['Xposition', 'Yposition', 'Zposition'])
+            if 1e-02 < sum([sum([abs(d) for d in (key.Rotation - glm.quat()).to_list()]) for key in keys]):
+                bvh.Channels.extend(['Zrotation', 'Xrotation', 'Yrotation'])
+            bvh.Keyframes = [bvhio.Pose(bvh.Offset + worldSpace.Space * key.Position, worldSpace.Rotation * key.Rotation * glm.inverse(worldSpace.Rotation)) for key in keys]
+            bvh.Children = [convertPerFrame(child, frames, worldSpace.duplicate()) for child in joint.Children]
+            return bvh
+
+        hierarchy = bvhio.readAsHierarchy('bvhio/tests/example.bvh')
+        hierarchy.filter('Head')[0].Keyframes = []
+        hierarchy.filter('Chest')[0].setKeyframe(2, bvhio.Transform(position=(1, 2, 3)), keep=None)
+        for (joint, _, _), (expected, _, _) in zip(bvhio.convertHierarchyToBvh(hierarchy, 5).layout(), convertPerFrame(hierarchy, 5, bvhio.Pose()).layout()):
+            self.assertEqual(joint.Channels, expected.Channels)
+            self.assertEqual(len(joint.Keyframes), 5)
+            for key, expectedKey in zip(joint.Keyframes, expected.Keyframes):
+                self.assertGreater(1e-04, glm.length(key.Position - expectedKey.Position))
+                self.assertGreater(1e-05, 1 - abs(glm.dot(key.Rotation, expectedKey.Rotation)))
+
+        # poses changed in place are written, views are only created on request
+        bvh = bvhio.convertHierarchyToBvh(hierarchy, 2)
+        self.assertIsInstance(bvh.Keyframes, list)
+        self.assertIsInstance(bvhio.convertHierarchyToBvh(hierarchy, 2, columnar=True).Keyframes, bvhio.BvhKeyframes)
+        bvh.Keyframes[1].Position = glm.vec3(1, 2, 3)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'changed.bvh')
+            bvhio.writeBvh(path, bvhio.BvhContainer(bvh, 2, 1 / 30))
+            self.assertGreater(1e-06, glm.length(bvhio.readAsBvh(path).Root.Keyframes[1].Position - glm.vec3(1, 2, 3)))
+
+    def test_readAsBvhMemoryMap(self):
+        reference = bvhio.readAsBvh('bvhio/tests/example.bvh', columnar=True)
+        data = bvhio.readAsBvh('bvhio/tests/example.bvh', columnar=True, memoryMap=True)
+        self.assertTrue(numpy.array_equal(reference.Motion, data.Motion))
+        with bvhio.BvhStream('bvhio/tests/example.bvh', sidecar=False, memoryMap=True) as stream:
+            self.assertTrue(numpy.array_equal(reference.Motion[::-1], stream[::-1]))
+
+    def test_BvhStream(self):
+        reference = bvhio.readAsBvh('bvhio/tests/example.bvh', columnar=True)
+        with bvhio.BvhStream('bvhio/tests/example.bvh') as stream:
+            self.assertEqual(stream.FrameCount, reference.FrameCount)
+            self.assertEqual(stream.FrameTime, reference.FrameTime)
+            self.assertEqual([j.Name for j, i, d in stream.Root.layout()], [j.Name for j, i, d in reference.Root.layout()])
+            self.assertTrue(numpy.array_equal(numpy.array(list(stream)), reference.Motion))
+            chunks = list(stream.chunks(size=1))
+            self.assertEqual(len(chunks), reference.FrameCount)
+            self.assertTrue(numpy.array_equal(numpy.concatenate(chunks), reference.Motion))
+
+    def test_BvhStreamIndex(self):
+        reference = bvhio.readAsBvh('bvhio/tests/example.bvh', columnar=True)
+        with open('bvhio/tests/example.bvh') as file:
+            text = file.read()
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'example.bvh')
+            with open(path, 'w') as file:
+                file.write(text)
+
+            with bvhio.BvhStream(path) as stream:
+                self.assertTrue(numpy.array_equal(stream[1], reference.Motion[1]))
+                self.assertTrue(numpy.array_equal(stream[-2], reference.Motion[0]))
+                self.assertTrue(numpy.array_equal(stream[::-1], reference.Motion[::-1]))
+                self.assertRaises(IndexError, stream.__getitem__, 2)
+            self.assertTrue(os.path.exists(f'{path}.idx'))
+
+            with bvhio.BvhStream(path) as stream, numpy.load(f'{path}.idx') as sidecar:
+                self.assertTrue(numpy.array_equal(stream.getIndex(), sidecar['offsets']))
+
+            # a corrupt sidecar is rebuilt and replaced
+            with open(f'{path}.idx', 'wb') as file:
+                file.write(b'PK\x03\x04 truncated')
+            with bvhio.BvhStream(path) as stream:
+                self.assertTrue(numpy.array_equal(stream[0:2], reference.Motion))
+            with numpy.load(f'{path}.idx') as sidecar:
+                self.assertEqual(len(sidecar['offsets']), 3)
+            self.assertEqual([name for name in os.listdir(folder) if name.endswith('.tmp')], [])
+
+            with open(path, 'w') as file:
+                file.write(text.replace('Frame Time: 0.033333', 'Frame Time: 0.0333333'))
+            with bvhio.BvhStream(path) as stream:
+                self.assertTrue(numpy.array_equal(stream[0:2], reference.Motion))
+
+    def test_BvhStreamBlankLines(self):
+        reference = bvhio.readAsBvh('bvhio/tests/example.bvh', columnar=True)
+        with open('bvhio/tests/example.bvh') as file:
+            lines = file.read().splitlines()
+
+        # blank and whitespace-only lines inside the motion block are not frames
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'blank.bvh')
+            with open(path, 'w') as file:
+                file.write('\n'.join(lines[:-2] + ['', '  \t', lines[-2], '', lines[-1]]))
+            for blockSize in [StreamModule._IndexBlockSize, 7]:
+                with unittest.mock.patch.object(StreamModule, '_IndexBlockSize', blockSize):
+                    for memoryMap in [False, True]:
+                        with bvhio.BvhStream(path, sidecar=False, memoryMap=memoryMap) as stream:
+                            self.assertTrue(numpy.array_equal(stream[0], reference.Motion[0]))
+                            self.assertTrue(numpy.array_equal(stream[1], reference.Motion[1]))
+                            self.assertTrue(numpy.array_equal(stream[::-1], reference.Motion[::-1]))
+                            self.assertTrue(numpy.array_equal(stream.read(0, 2), reference.Motion))
+                            self.assertTrue(numpy.array_equal(numpy.array(list(stream)), reference.Motion))
+                            self.assertTrue(numpy.array_equal(numpy.concatenate(list(stream.chunks(size=1))), reference.Motion))
+
+    def test_readAsBvhCache(self):
+        reference = bvhio.readAsBvh('bvhio/tests/example.bvh', columnar=True)
+        with open('bvhio/tests/example.bvh') as file:
+            text = file.read()
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'example.bvh')
+            with open(path, 'w') as file:
+                file.write(text)
+
+            bvhio.readAsBvh(path, cache=True)
+            self.assertTrue(os.path.exists(f'{path}.cache.npz'))
+            bvh = bvhio.readAsBvh(path, columnar=True, cache=True)
+            self.assertTrue(numpy.array_equal(bvh.Motion, reference.Motion))
+            self.assertEqual(bvh.FrameTime, reference.FrameTime)
+            for (joint, _, _), (expected, _, _) in zip(bvh.Root.layout(), reference.Root.layout()):
+                self.assertEqual(joint.Name, expected.Name)
+                self.assertEqual(joint.Offset, expected.Offset)
+                self.assertEqual(joint.EndSite, expected.EndSite)
+                self.assertEqual(joint.Channels, expected.Channels)
+                self.assertEqual(len(joint.Children), len(expected.Children))
+            self.assertEqual(len(bvhio.readAsBvh(path, loadKeyFrames=False, cache=True).Root.Keyframes), 0)
+            self.assertEqual(len(bvhio.readAsHierarchy(path, cache=True).layout()), len(reference.Root.layout()))
+
+            # a corrupt cache is ignored and rewritten
+            for junk in [b'PK\x03\x04 junk', b'not a cache']:
+                with open(f'{path}.cache.npz', 'wb') as file:
+                    file.write(junk)
+                bvh = bvhio.readAsBvh(path, columnar=True, cache=True)
+                self.assertTrue(numpy.array_equal(bvh.Motion, reference.Motion))
+                self.assertIsNotNone(ParserModule.Cache.readCache(f'{path}.cache.npz', os.stat(path)))
+
+            # a changed file invalidates the cache
+            with open(path, 'w') as file:
+                file.write(text.replace('Frame Time: 0.033333', 'Frame Time: 0.05'))
+            self.assertEqual(bvhio.readAsBvh(path, cache=True).FrameTime, 0.05)
+
+            cacheFolder = os.path.join(folder, 'cache')
+            bvhio.readAsBvh(path, cache=cacheFolder)
+            self.assertEqual(len(os.listdir(cacheFolder)), 1)
+            self.assertEqual(bvhio.readAsBvh(path, cache=cacheFolder).FrameTime, 0.05)
+
+    def test_readAsBvhSelection(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'example.bvh')
+            bvhio.writeBvh(path, bvhio.readAsBvh('bvhio/tests/example.bvh').resample(0.033333 / 4))
+            reference = bvhio.readAsBvh(path, columnar=True)
+            layout = [joint for joint, _, _ in reference.Root.layout()]
+            columns = [column for joint in layout if joint.Name in ('Hips', 'LeftHand') for column in joint.Keyframes.getChannelColumns(joint.Channels)]
+
+            # the selection is also applied to cached motion, but never written into the cache
+            bvhio.readAsBvh(path, cache=True)
+            for options in [{}, {'memoryMap': True}, {'cache': True}]:
+                bvh = bvhio.readAsBvh(path, columnar=True, frames=slice(1, None, 2), **options)
+                self.assertEqual(bvh.FrameCount, 2)
+                self.assertEqual(bvh.FrameTime, reference.FrameTime * 2)
+                self.assertTrue(numpy.array_equal(bvh.Motion, reference.Motion[1::2]))
+
+                bvh = bvhio.readAsBvh(path, frames=range(0, 4, 3), joints=['Hips', 'LeftHand'], **options)
+                for joint, expected in zip([joint for joint, _, _ in bvh.Root.layout()], layout):
+                    if joint.Name not in ('Hips', 'LeftHand'):
+                        self.assertEqual(joint.Keyframes, [])
+                        continue
+                    self.assertEqual(len(joint.Keyframes), 2)
+                    for key, expectedKey in zip(joint.Keyframes, [expected.Keyframes[0], expected.Keyframes[3]]):
+                        self.assertGreater(1e-04, glm.length(key.Position - expectedKey.Position))
+                        self.assertGreater(1e-05, 1 - abs(glm.dot(key.Rotation, expectedKey.Rotation)))
+
+                bvh = bvhio.readAsBvh(path, columnar=True, joints=['Hips', 'LeftHand'], **options)
+                self.assertTrue(numpy.array_equal(bvh.Motion, reference.Motion[:, columns]))
+            self.assertRaises(ValueError, bvhio.readAsBvh, path, joints=['Tail'])
+            self.assertRaises(ValueError, bvhio.readAsBvh, path, frames=slice(None, None, -1))
+
+    def test_readAsBvhDtype(self):
+        reference = bvhio.readAsBvh('bvhio/tests/example.bvh', columnar=True)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'example.bvh')
+            with open('bvhio/tests/example.bvh') as source, open(path, 'w') as file:
+                file.write(source.read())
+
+            for options in [{}, {'memoryMap': True}, {'cache': True}, {'cache': True}]:
+                bvh = bvhio.readAsBvh(path, columnar=True, dtype=numpy.float32, **options)
+                self.assertEqual(bvh.Motion.dtype, numpy.float32)
+                self.assertTrue(numpy.allclose(bvh.Motion, reference.Motion))
+                self.assertEqual(bvh.Root.Keyframes.getRotations().dtype, numpy.float32)
+                self.assertFalse(os.path.exists(f'{path}.cache.npz'))
+
+            # float32 reads do not write the cache, but can use it
+            bvhio.readAsBvh(path, cache=True)
+            self.assertEqual(bvhio.readAsBvh(path, columnar=True, cache=True, dtype=numpy.float32).Motion.dtype, numpy.float32)
+            self.assertTrue(numpy.array_equal(bvhio.readAsBvh(path, columnar=True, cache=True).Motion, reference.Motion))
+
+        with bvhio.BvhStream('bvhio/tests/example.bvh', sidecar=False, dtype=numpy.float32) as stream:
+            self.assertEqual(stream[0:2].dtype, numpy.float32)
+            self.assertEqual(next(iter(stream)).dtype, numpy.float32)
+
+    def test_readAsBvhBatch(self):
+        reference = bvhio.readAsBvh('bvhio/tests/example.bvh', columnar=True)
+        with tempfile.TemporaryDirectory() as folder:
+            broken = os.path.join(folder, 'broken.bvh')
+            with open(broken, 'w') as file:
+                file.write('HIERARCHY\nJOINT Hips\n')
+            paths = ['bvhio/tests/example.bvh', broken, os.path.join(folder, 'missing.bvh'), 'bvhio/tests/example.bvh']
+
+            for workers in [1, 2]:
+                results = bvhio.readAsBvhBatch(paths, workers=workers)
+                self.assertEqual(len(results), 4)
+                self.assertTrue(numpy.array_equal(results[0].Motion, reference.Motion))
+                self.assertIsInstance(results[1], SyntaxError)
+                self.assertIsInstance(results[2], FileNotFoundError)
+                self.assertTrue(numpy.array_equal(results[3].Root.Keyframes.getRotations(), reference.Root.Keyframes.getRotations()))
+
+    def test_readAsBvhMotionMismatch(self):
+        with open('bvhio/tests/example.bvh') as file:
+            lines = file.read().splitlines()
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'broken.bvh')
+            for broken in [lines[:-1], lines[:-1] + [lines[-1] + ' 1.0'], lines[:-1] + [lines[-1] + ' X']]:
+                with open(path, 'w') as file:
+                    file.write('\n'.join(broken) + '\n')
+                self.assertRaises(SyntaxError, bvhio.readAsBvh, path)
+                self.assertRaises(SyntaxError, bvhio.readAsBvh, path, memoryMap=True)
+
+    def test_readAsBvhBlankLines(self):
+        reference = bvhio.readAsBvh('bvhio/tests/example.bvh', columnar=True)
+        with open('bvhio/tests/example.bvh') as file:
+            lines = file.read().splitlines()
+
+        # blank lines in the motion block are skipped without warnings
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'blank.bvh')
+            with open(path, 'w') as file:
+                file.write('\n'.join(lines[:-1] + ['', ' \t', lines[-1], '  ']) + '\n')
+            for options in [{}, {'memoryMap': True}, {'joints': ['Hips']}, {'frames': slice(None, None, 1)}]:
+                with warnings.catch_warnings():
+                    warnings.simplefilter('error')
+                    bvh = bvhio.readAsBvh(path, columnar=True, **options)
+                self.assertTrue(numpy.array_equal(bvh.Root.Keyframes.getPositions(), reference.Root.Keyframes.getPositions()))
+
+    def test_readAsBvhSelectionMismatch(self):
+        with open('bvhio/tests/example.bvh') as file:
+            lines = file.read().splitlines()
+
+        # values of unselected joints are not parsed, but every line must have all channels
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'broken.bvh')
+            for broken in [lines[:-1], lines[:-1] + [lines[-1] + ' 1.0'], lines[:-1] + [lines[-1].rsplit(' ', 1)[0]]]:
+                with open(path, 'w') as file:
+                    file.write('\n'.join(broken) + '\n')
+                for options in [{}, {'memoryMap': True}, {'frames': slice(None, None, 1)}]:
+                    self.assertRaises(SyntaxError, bvhio.readAsBvh, path, joints=['Hips'], **options)
+
+    def test_writeBvhRoundTrip(self):
+        reference = bvhio.readAsBvh('bvhio/tests/example.bvh', columnar=True)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'example.bvh')
+
+            # unchanged columnar channels are copied
+            bvhio.writeBvh(path, reference)
+            self.assertTrue(numpy.array_equal(bvhio.readAsBvh(path, columnar=True).Motion, reference.Motion))
+
+            # poses are converted back into euler angles, with the precision of the float32 poses
+            bvhio.writeBvh(path, bvhio.readAsBvh('bvhio/tests/example.bvh'))
+            motion = bvhio.readAsBvh(path, columnar=True).Motion
+            self.assertEqual(motion.shape, reference.Motion.shape)
+            self.assertGreater(1e-04, numpy.abs(motion - reference.Motion).max())
+
+            # missing keyframes are an error for poses and columnar data
+            for bvh in [bvhio.readAsBvh('bvhio/tests/example.bvh'), bvhio.readAsBvh('bvhio/tests/example.bvh', columnar=True)]:
+                bvh.FrameCount += 1
+                self.assertRaises(ValueError, bvhio.writeBvh, path, bvh)
+
+    def test_formatMotion(self):
+        motion = numpy.random.default_rng(0).uniform(-180, 180, (200, 12))
+        motion[::3, 0] = 0
+        motion[::5, 1] = -0.0
+        motion[::7, 2] = 3e-06
+        motion[::11, 3] = 4e-10
+        motion[::13, 4] = 1e+12
+        motion[::17, 5] = numpy.round(motion[::17, 5], 2)
+        motion[::19, 6] = -2e-12
+        motion[::23, 7] = 4e-07
+        for percision in (0, 2, 6, 9, 16):
+            expected = ''.join([''.join(f'{round(value, percision)} ' for value in row) + '\n' for row in motion.tolist()])
+            self.assertEqual(expected, ParserModule._formatMotion(motion, percision, fast=False))
+            self.assertEqual(motion.shape, numpy.loadtxt(ParserModule._formatMotion(motion, percision, fast=True).splitlines(), ndmin=2).shape)